@@ -0,0 +1,112 @@
+import os
+import sys
+import csv
+import json
+import time
+from multiprocessing import Pool
+
+# Procesamiento masivo de documentos a partir de un manifiesto (CSV o NDJSON) con las
+# columnas file_path, document_type, ruc, auxiliar y auxiliar_hes. Cada resultado se
+# escribe como una línea NDJSON apenas termina, de modo que si el proceso se
+# interrumpe los documentos ya procesados se saltan al reanudar.
+
+MANIFEST_FIELDS = ["file_path", "document_type", "ruc", "auxiliar", "auxiliar_hes"]
+
+def load_manifest(manifest_path):
+    """
+    Lee el manifiesto y devuelve una lista de entradas con las columnas esperadas.
+    """
+    entries = []
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        if manifest_path.endswith(('.ndjson', '.jsonl')):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+
+        for row in rows:
+            entry = {field: (row.get(field) or None) for field in MANIFEST_FIELDS}
+            if not entry["file_path"] or not entry["document_type"]:
+                raise ValueError(f"Entrada de manifiesto incompleta: {row}")
+            entry["ruc"] = entry["ruc"] or ""
+            entry["auxiliar"] = entry["auxiliar"] or ""
+            entries.append(entry)
+    return entries
+
+def entry_key(entry):
+    return f"{entry['document_type']}::{entry['file_path']}"
+
+def load_completed(output_path):
+    """
+    Devuelve las claves de los documentos que ya tienen resultado en el archivo de salida.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                completed.add(json.loads(line)["key"])
+            except (json.JSONDecodeError, KeyError):
+                # Línea truncada por una interrupción: el documento se vuelve a procesar
+                continue
+    return completed
+
+def init_worker():
+    # Un hilo de Tesseract por proceso para no sobre-suscribir los núcleos
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+    import config
+    import process  # Precarga las librerías de extracción en cada proceso
+
+def process_entry(entry):
+    from contextlib import redirect_stdout
+    from process import process_single_document
+
+    start_time = time.time()
+    with redirect_stdout(sys.stderr):
+        result = process_single_document(
+            entry["file_path"],
+            entry["document_type"],
+            entry["ruc"],
+            entry["auxiliar"],
+            entry["auxiliar_hes"],
+        )
+    return {
+        "key": entry_key(entry),
+        "file_path": entry["file_path"],
+        "document_type": entry["document_type"],
+        "elapsed": time.time() - start_time,
+        "result": result,
+    }
+
+def run_batch(manifest_path, output_path=None, workers=None, chunksize=4):
+    """
+    Procesa el manifiesto en un pool de procesos y escribe un resultado NDJSON por documento.
+    """
+    output_path = output_path or f"{os.path.splitext(manifest_path)[0]}.results.ndjson"
+    workers = workers or os.cpu_count() or 1
+
+    entries = load_manifest(manifest_path)
+    completed = load_completed(output_path)
+    pending = [entry for entry in entries if entry_key(entry) not in completed]
+
+    print(f"Manifiesto con {len(entries)} documentos, {len(entries) - len(pending)} ya procesados, {len(pending)} pendientes", file=sys.stderr)
+    if not pending:
+        return 0
+
+    start_time = time.time()
+    processed = 0
+    with open(output_path, 'a', encoding='utf-8') as output, Pool(processes=workers, initializer=init_worker) as pool:
+        for record in pool.imap_unordered(process_entry, pending, chunksize=chunksize):
+            line = json.dumps(record, ensure_ascii=False)
+            output.write(line + "\n")
+            output.flush()
+            print(line, flush=True)
+
+            processed += 1
+            if processed % 100 == 0 or processed == len(pending):
+                elapsed = time.time() - start_time
+                print(f"{processed}/{len(pending)} documentos ({processed / elapsed:.2f} docs/s)", file=sys.stderr)
+
+    return processed
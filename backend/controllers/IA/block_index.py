@@ -0,0 +1,36 @@
+from bisect import bisect_left, bisect_right
+
+class BlockIndex:
+    """
+    Índice de los bloques de texto de una página (page.get_text("blocks")) ordenado por
+    coordenada vertical. Responde consultas por franja y por rectángulo con búsqueda
+    binaria y devuelve los bloques en el orden de lectura original de PyMuPDF.
+    """
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self._order = sorted(range(len(blocks)), key=lambda i: (blocks[i][1], blocks[i][0]))
+        self._tops = [blocks[i][1] for i in self._order]
+
+    def _band_positions(self, y_min=None, y_max=None):
+        # Límites exclusivos, igual que los filtros `y_min < block[1] < y_max`
+        start = bisect_right(self._tops, y_min) if y_min is not None else 0
+        end = bisect_left(self._tops, y_max) if y_max is not None else len(self._tops)
+        return self._order[start:end]
+
+    def band(self, y_min=None, y_max=None):
+        """Bloques cuyo borde superior está estrictamente entre y_min e y_max."""
+        return [self.blocks[i] for i in sorted(self._band_positions(y_min, y_max))]
+
+    def rect(self, x_min=None, y_min=None, x_max=None, y_max=None):
+        """Bloques cuya esquina superior izquierda está estrictamente dentro del rectángulo."""
+        hits = [
+            i for i in self._band_positions(y_min, y_max)
+            if (x_min is None or self.blocks[i][0] > x_min) and (x_max is None or self.blocks[i][0] < x_max)
+        ]
+        return [self.blocks[i] for i in sorted(hits)]
+
+    def band_text(self, y_min=None, y_max=None):
+        return " ".join(block[4] for block in self.band(y_min, y_max))
+
+    def rect_text(self, x_min=None, y_min=None, x_max=None, y_max=None):
+        return " ".join(block[4] for block in self.rect(x_min, y_min, x_max, y_max))
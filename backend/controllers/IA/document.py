@@ -0,0 +1,263 @@
+import io
+import os
+import fitz
+from PIL import Image
+
+from block_index import BlockIndex
+
+# Clasificación de páginas: con al menos TEXT_LAYER_MIN_CHARS caracteres la página tiene
+# una capa de texto utilizable. Sin ella, o si el texto cubre menos de TEXT_COVERAGE_MIN
+# de una página cubierta por imágenes (un escaneo con un pie de página, por ejemplo), es
+# una página escaneada. Si tiene texto y las imágenes sin texto encima cubren al menos
+# OCR_IMAGE_COVERAGE_MIN de la página es mixta: esas imágenes se reconocen con OCR. Una
+# página sin texto ni imágenes se trata como de texto (no hay nada que reconocer).
+TEXT_LAYER_MIN_CHARS = 20
+TEXT_COVERAGE_MIN = 0.02
+IMAGE_COVERAGE_THRESHOLD = 0.5
+OCR_IMAGE_COVERAGE_MIN = 0.05
+
+class ParsedDocument:
+    """
+    Documento abierto una sola vez y compartido por extracciones y validaciones.
+    Memoriza el texto, los bloques, las imágenes incrustadas y los pixmaps de cada página.
+    """
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.extension = os.path.splitext(file_path)[1].lower()
+        self._doc = None
+        self._image = None
+        self._xml_tree = None
+        self._text = None
+        self._embedded_images = None
+        self._image_placements = None
+        self._pages = {}
+        self._page_text = {}
+        self._page_blocks = {}
+        self._block_indexes = {}
+        self._pixmaps = {}
+        self._classifications = {}
+        self._ink_maps = {}
+        self._page_ocrs = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+        self._pages.clear()
+        self._pixmaps.clear()
+        self._ink_maps.clear()
+        self._page_ocrs.clear()
+
+    @property
+    def is_pdf(self):
+        return self.extension == ".pdf"
+
+    @property
+    def is_image(self):
+        return self.extension == ".png"
+
+    @property
+    def is_xml(self):
+        return self.extension == ".xml"
+
+    @property
+    def doc(self):
+        if self._doc is None:
+            self._doc = fitz.open(self.file_path)
+        return self._doc
+
+    @property
+    def page_count(self):
+        return self.doc.page_count
+
+    def page(self, page_num):
+        if page_num not in self._pages:
+            self._pages[page_num] = self.doc.load_page(page_num)
+        return self._pages[page_num]
+
+    def page_text(self, page_num):
+        if page_num not in self._page_text:
+            self._page_text[page_num] = self.page(page_num).get_text()
+        return self._page_text[page_num]
+
+    @property
+    def text(self):
+        """Texto completo del PDF, en el mismo formato que page.get_text() concatenado."""
+        if self._text is None:
+            self._text = "".join(self.page_text(page_num) for page_num in range(self.page_count)).strip()
+        return self._text
+
+    def blocks(self, page_num):
+        if page_num not in self._page_blocks:
+            self._page_blocks[page_num] = self.page(page_num).get_text("blocks")
+        return self._page_blocks[page_num]
+
+    def block_index(self, page_num):
+        if page_num not in self._block_indexes:
+            self._block_indexes[page_num] = BlockIndex(self.blocks(page_num))
+        return self._block_indexes[page_num]
+
+    def image_placements(self):
+        """
+        Imágenes incrustadas del PDF con su página, índice, xref, tamaño en píxeles y
+        posición (bbox en coordenadas de página), sin decodificarlas.
+        """
+        if self._image_placements is None:
+            placements = []
+            for page_num in range(self.page_count):
+                page = self.page(page_num)
+                for img_index, img in enumerate(page.get_images(full=True)):
+                    xref = img[0]
+                    rects = page.get_image_rects(xref)
+                    placements.append({
+                        "page": page_num + 1,
+                        "index": img_index + 1,
+                        "xref": xref,
+                        "width": img[2],
+                        "height": img[3],
+                        "bbox": rects[0] if rects else None,
+                    })
+            self._image_placements = placements
+        return self._image_placements
+
+    def embedded_images(self):
+        """
+        Imágenes incrustadas del PDF, decodificadas una sola vez.
+        """
+        if self._embedded_images is None:
+            images = []
+            for placement in self.image_placements():
+                base_image = self.doc.extract_image(placement["xref"])
+                images.append({
+                    "page": placement["page"],
+                    "index": placement["index"],
+                    "image": Image.open(io.BytesIO(base_image["image"])),
+                    "bbox": placement["bbox"],
+                })
+            self._embedded_images = images
+        return self._embedded_images
+
+    def page_classification(self, page_num):
+        """
+        Cobertura de texto e imágenes de la página, su tipo ("text", "mixed" o "image") y
+        las regiones a reconocer con OCR (imágenes sin texto encima, en coordenadas de página).
+        """
+        if page_num not in self._classifications:
+            page = self.page(page_num)
+            page_area = abs(page.rect) or 1.0
+            text_rects = [
+                fitz.Rect(block[:4]) & page.rect
+                for block in self.blocks(page_num) if block[6] == 0 and block[4].strip()
+            ]
+            image_rects = [fitz.Rect(info["bbox"]) & page.rect for info in page.get_image_info()]
+            image_rects = [rect for rect in image_rects if not rect.is_empty]
+            ocr_regions = [
+                tuple(rect) for rect in image_rects
+                if not any(rect.intersects(text_rect) for text_rect in text_rects)
+            ]
+
+            text_coverage = min(sum(abs(rect) for rect in text_rects) / page_area, 1.0)
+            image_coverage = min(sum(abs(rect) for rect in image_rects) / page_area, 1.0)
+            ocr_coverage = min(sum(abs(fitz.Rect(region)) for region in ocr_regions) / page_area, 1.0)
+            has_text_layer = len(self.page_text(page_num).strip()) >= TEXT_LAYER_MIN_CHARS
+            if has_text_layer and text_coverage < TEXT_COVERAGE_MIN and image_coverage >= IMAGE_COVERAGE_THRESHOLD:
+                has_text_layer = False  # Poco texto sobre un escaneo: no alcanza como capa de texto
+
+            if not has_text_layer and image_coverage > 0:
+                kind = "image"
+                ocr_regions = []  # Se reconoce la página completa
+            elif ocr_coverage >= OCR_IMAGE_COVERAGE_MIN:
+                kind = "mixed"
+            else:
+                kind = "text"
+                ocr_regions = []
+
+            self._classifications[page_num] = {
+                "text_coverage": text_coverage,
+                "image_coverage": image_coverage,
+                "kind": kind,
+                "ocr_regions": ocr_regions,
+            }
+        return self._classifications[page_num]
+
+    def has_text_layer(self, page_num):
+        return self.page_classification(page_num)["kind"] != "image"
+
+    def region_text(self, page_num, box):
+        """
+        Texto de la capa PDF dentro de box = (left, top, right, bottom) en coordenadas de
+        página, o "" si la página no tiene capa de texto.
+        """
+        if not self.has_text_layer(page_num):
+            return ""
+        return self.page(page_num).get_textbox(fitz.Rect(box)).strip()
+
+    def pixmap(self, page_num, dpi=None, grayscale=False, clip=None):
+        key = (page_num, dpi, grayscale, tuple(clip) if clip else None)
+        if key not in self._pixmaps:
+            self._pixmaps[key] = self.page(page_num).get_pixmap(
+                dpi=dpi,
+                colorspace=fitz.csGRAY if grayscale else fitz.csRGB,
+                clip=fitz.Rect(clip) if clip else None,
+                alpha=False,
+            )
+        return self._pixmaps[key]
+
+    def render_page(self, page_num, dpi=None, grayscale=False, clip=None):
+        """
+        Imagen PIL de la página (o solo de la región clip, en coordenadas de página).
+        """
+        pix = self.pixmap(page_num, dpi, grayscale, clip)
+        return Image.frombytes("L" if grayscale else "RGB", [pix.width, pix.height], pix.samples)
+
+    def gray_array(self, page_num, dpi=None, clip=None):
+        """
+        Página (o región clip) en escala de grises como vista de NumPy sobre el pixmap, sin copias.
+        """
+        from image_buffer import pixmap_array
+        return pixmap_array(self.pixmap(page_num, dpi, grayscale=True, clip=clip))
+
+    def ink_map(self, page_num, dpi=None):
+        """
+        Integrales de tinta de la página (una vez por página) para consultar regiones en
+        coordenadas de página.
+        """
+        from ink_density import InkMap, INK_DPI
+
+        dpi = dpi or INK_DPI
+        key = (page_num, dpi)
+        if key not in self._ink_maps:
+            self._ink_maps[key] = InkMap(self.gray_array(page_num, dpi), scale=dpi / 72)
+        return self._ink_maps[key]
+
+    def page_ocr(self, page_num, dpi, lang):
+        """
+        OCR completo de la página renderizada a dpi (una vez por página e idioma); las
+        regiones se consultan con sus cajas escaladas por dpi / 72.
+        """
+        from page_ocr import PageOCR
+
+        key = (page_num, dpi, lang)
+        if key not in self._page_ocrs:
+            self._page_ocrs[key] = PageOCR(self.render_page(page_num, dpi=dpi), lang)
+        return self._page_ocrs[key]
+
+    @property
+    def image(self):
+        """Imagen de un documento PNG."""
+        if self._image is None:
+            self._image = Image.open(self.file_path)
+        return self._image
+
+    @property
+    def xml_tree(self):
+        if self._xml_tree is None:
+            import xml.etree.ElementTree as ET
+            self._xml_tree = ET.parse(self.file_path)
+        return self._xml_tree
@@ -0,0 +1,149 @@
+import os
+import json
+import hashlib
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+from tensor_cache import file_hash
+
+# Caché de embeddings del backbone congelado de DocumentCNN. Como el backbone no se entrena,
+# su salida para un archivo depende solo del contenido, del backbone (arquitectura y pesos)
+# y del tamaño de entrada: se calcula una vez, se guarda en una matriz float16 en disco y
+# el clasificador se entrena directamente sobre ella en todas las épocas y folds.
+#
+# Los pesos del backbone se guardan junto al caché y se cargan en cada modelo nuevo, así
+# los embeddings guardados siguen siendo válidos entre folds y ejecuciones. Los folds que
+# corren en paralelo comparten el caché: las escrituras se hacen con un bloqueo de archivo.
+
+class EmbeddingDataset(Dataset):
+    def __init__(self, features, labels):
+        self.features = features
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        return torch.from_numpy(self.features[idx].astype(np.float32)), torch.tensor(self.labels[idx], dtype=torch.long)
+
+class EmbeddingCache:
+    """
+    Embeddings float16 por hash de contenido en <cache_dir>/<backbone>_<huella>_<tamaño>/.
+    """
+    def __init__(self, cache_dir, model, input_size=400):
+        self.model = model
+        self.input_size = input_size
+        self.backbone_name = type(model.backbone).__name__.lower()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.lock_path = os.path.join(cache_dir, ".lock")
+        with self._lock():
+            self.fingerprint = self._prepare_backbone(cache_dir)
+
+        self.directory = os.path.join(cache_dir, f"{self.backbone_name}_{self.fingerprint}_{input_size}")
+        self.data_path = os.path.join(self.directory, "embeddings.f16")
+        self.manifest_path = os.path.join(self.directory, "manifest.json")
+        self.rows = {}
+        self.dim = None
+        self._load_manifest()
+
+    @contextlib.contextmanager
+    def _lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path) and os.path.exists(self.data_path):
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+            self.rows = manifest["rows"]
+            self.dim = manifest["dim"]
+
+    def _prepare_backbone(self, cache_dir):
+        # Reutiliza los pesos guardados del backbone o guarda los del modelo actual
+        weights_path = os.path.join(cache_dir, f"backbone_{self.backbone_name}.pth")
+        if os.path.exists(weights_path):
+            self.model.backbone.load_state_dict(torch.load(weights_path, map_location="cpu"))
+        else:
+            temp_path = weights_path + ".tmp"
+            torch.save(self.model.backbone.state_dict(), temp_path)
+            os.replace(temp_path, weights_path)
+
+        digest = hashlib.sha256()
+        with open(weights_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()[:12]
+
+    def _save_manifest(self):
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({"dim": self.dim, "rows": self.rows}, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def _content_hashes(self, dataset, indices):
+        cached = dataset.cache.entries if getattr(dataset, "cache", None) else {}
+        paths = [dataset.file_paths[idx] for idx in indices]
+        return [cached[path]["hash"] if path in cached else file_hash(path) for path in paths]
+
+    def embed(self, dataset, device, indices=None, batch_size=64, collate_fn=None):
+        """
+        Matriz float16 (muestras, dim) con el embedding de las muestras indices del dataset
+        (todas por defecto), en ese orden. Solo pasan por el backbone los archivos que no
+        están en el caché.
+        """
+        indices = list(range(len(dataset))) if indices is None else list(indices)
+        hashes = self._content_hashes(dataset, indices)
+        if not hashes:
+            return np.zeros((0, self.dim or 0), dtype=np.float16)
+        pending = [position for position, content_hash in enumerate(hashes) if content_hash not in self.rows]
+        if pending:
+            with self._lock():
+                # Otro proceso pudo agregar filas mientras tanto
+                self._load_manifest()
+                pending = [position for position, content_hash in enumerate(hashes) if content_hash not in self.rows]
+                self._compute(dataset, device, indices, hashes, pending, batch_size, collate_fn)
+
+        matrix = np.memmap(self.data_path, dtype=np.float16, mode='r').reshape(-1, self.dim)
+        return matrix[[self.rows[content_hash] for content_hash in hashes]]
+
+    def _compute(self, dataset, device, indices, hashes, pending, batch_size, collate_fn):
+        if not pending:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.model.backbone.eval()
+        loader = DataLoader(
+            torch.utils.data.Subset(dataset, [indices[position] for position in pending]),
+            batch_size=batch_size,
+            shuffle=False,
+            collate_fn=collate_fn,
+        )
+        new_rows = []
+        with torch.no_grad():
+            for inputs, _ in loader:
+                features = self.model.backbone(inputs.to(device)).flatten(1)
+                new_rows.append(features.to(torch.float16).cpu().numpy())
+        features = np.concatenate(new_rows)
+        self.dim = features.shape[1]
+
+        first_row = os.path.getsize(self.data_path) // (self.dim * 2) if os.path.exists(self.data_path) else 0
+        with open(self.data_path, 'ab') as f:
+            f.write(features.tobytes())
+        for offset, position in enumerate(pending):
+            self.rows.setdefault(hashes[position], first_row + offset)
+        self._save_manifest()
+        print(f"Embeddings calculados: {len(pending)} nuevos, {len(self.rows)} en caché")
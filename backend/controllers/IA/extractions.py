@@ -1,70 +1,66 @@
 import re
-import pytesseract
-import fitz
+import ocr_cache
+from page_ocr import ocr_region, page_mode_enabled, PAGE_OCR_LANG
 from PIL import Image
-import numpy as np
-import cv2
-import io
-import camelot
 
 from utils import load_document_schema
 
+OCR_DPI = 300  # Resolución para reconocer páginas escaneadas
+
+# numpy, cv2 y camelot se importan dentro de las funciones que los usan para que
+# la inferencia de facturas no pague su tiempo de carga.
+
 # Contract
 def extract_field_from_region(image, field_info):
     if "region" in field_info:
         region = field_info["region"]
-        cropped_image = image.crop((
+        text = ocr_region(image, (
             region["left"],
             region["top"],
             region["left"] + region["width"],
             region["top"] + region["height"]
-        ))
-        text = pytesseract.image_to_string(cropped_image, lang="eng").strip()
+        ), lang="eng").strip()
         text = text.replace('\n', ' ').strip() 
         text = re.sub(r'\s+', ' ', text) 
         return text
     return None
 
-def extract_sequential_fields(text, schema, start_field, field_relations):
+def extract_field_chains(text, schema, document_type, start_fields):
     """
-    Extrae campos secuenciales a partir de un campo inicial, siguiendo las relaciones definidas.
+    Extrae los campos encadenados por "relative_to" a partir de cada campo inicial.
+    Las cadenas vienen precalculadas del esquema y cada campo se busca desde el final
+    del anterior con pattern.search(text, pos), sin copiar el texto.
     """
     extracted_data = {}
-    current_field = start_field
-    current_position = 0  # Posición inicial para la búsqueda
-
-    while current_field:
-        field_info = field_relations.get(current_field)
-        if not field_info:
-            break  # No hay más relaciones
-
-        regex = field_info.get("regex")
-        if not regex:
-            break  # El campo no tiene regex definido
-
-        # Buscar el texto a partir de la posición actual
-        match = re.search(regex, text[current_position:])
-        if match:
-            extracted_data[current_field] = match.group(1).strip()
-            current_position += match.end()  # Actualizar posición para el siguiente campo
-        else:
-            print(f"No se encontró el campo {current_field} en la secuencia.")
-            break  # Termina si no encuentra el campo actual
 
-        # Pasar al siguiente campo en la relación
-        current_field = next((k for k, v in field_relations.items() if v.get("relative_to") == current_field), None)
+    for start_field in start_fields:
+        current_position = 0  # Posición inicial para la búsqueda
+
+        for current_field in schema.chain(document_type, start_field):
+            pattern = schema.pattern(document_type, current_field)
+            if pattern is None:
+                break  # El campo no tiene regex definido
+
+            match = pattern.search(text, current_position)
+            if match:
+                extracted_data[current_field] = match.group(1).strip()
+                current_position = match.end()  # Actualizar posición para el siguiente campo
+            else:
+                print(f"No se encontró el campo {current_field} en la secuencia.")
+                break  # Termina si no encuentra el campo actual
 
     return extracted_data
 
-def extract_provider_fields(text):
-    # Cargar esquema relacionado con el proveedor
-    schema = load_document_schema()["Contract"]["fields"]  # Asegúrate de que esta ruta sea correcta
+def extract_sequential_fields(text, schema, start_field, field_relations, document_type="Contract"):
+    """
+    Extrae campos secuenciales a partir de un campo inicial, siguiendo las relaciones definidas.
+    """
+    chain_data = extract_field_chains(text, schema, document_type, [start_field])
+    return {field: value for field, value in chain_data.items() if field in field_relations}
 
+def extract_provider_fields(text):
     # Iniciar la extracción desde el campo inicial
-    start_field = "provider_info_intro"
-    provider_data = extract_sequential_fields(text, schema, start_field, provider_field_relations)
-
-    return provider_data
+    return extract_field_chains(text, load_document_schema(), "Contract", ["provider_info_intro"])
 
 def extract_relative_field(image, base_field, field_info):
     if "relative_to" in field_info and "offset" in field_info:
@@ -76,13 +72,12 @@ def extract_relative_field(image, base_field, field_info):
             "width": base_region["width"],
             "height": base_region["height"]
         }
-        cropped_image = image.crop((
+        text = ocr_region(image, (
             region["left"],
             region["top"],
             region["left"] + region["width"],
             region["top"] + region["height"]
-        ))
-        text = pytesseract.image_to_string(cropped_image, lang="eng").strip()
+        ), lang="eng").strip()
         text = text.replace('\n', ' ').strip() 
         text = re.sub(r'\s+', ' ', text) 
         return text
@@ -95,11 +90,13 @@ def extract_field_from_xml(xml_tree, field_info):
         return element.text if element is not None else None
     return None
 
-def extract_table_with_camelot(pdf_path, page_number):
+def extract_table_with_camelot(document, page_number):
     """
     Extrae tablas del PDF utilizando Camelot.
     """
-    tables = camelot.read_pdf(pdf_path, pages=str(page_number), flavor='stream')  # stream para tablas sin líneas
+    import camelot
+
+    tables = camelot.read_pdf(document.file_path, pages=str(page_number), flavor='stream')  # stream para tablas sin líneas
     if not tables:
         return [], ["No se encontraron tablas en la página."]
     
@@ -175,71 +172,36 @@ def process_row(row_text, table_schema):
 
     return row
 
-def extract_text_from_document(file_path):
+def extract_text_from_document(document):
     """Extrae texto de un documento utilizando Tesseract."""
     try:
-        image = Image.open(file_path)
-        text = pytesseract.image_to_string(image, lang="eng")
+        text = ocr_cache.image_to_string(document.image, lang="eng")
         text = text.replace('\n', ' ').strip() 
         text = re.sub(r'\s+', ' ', text) 
         return text
     except Exception as e:
-        raise ValueError(f"Error al extraer texto del documento {file_path}: {e}")
+        raise ValueError(f"Error al extraer texto del documento {document.file_path}: {e}")
 
 def extract_section(text, start_marker, end_marker=None):
     start_idx = text.find(start_marker)
     end_idx = text.find(end_marker, start_idx) if end_marker else len(text)
     return text[start_idx:end_idx]
 
-def extract_tax_id(image_path):
-    image = Image.open(image_path)
-    cropped_image = image.crop((72, 150, 200, 160))  # Usar coordenadas detectadas
-    text = pytesseract.image_to_string(cropped_image, lang="eng")
+def extract_tax_id(document):
+    text = ocr_region(document.image, (72, 150, 200, 160), lang="eng")  # Usar coordenadas detectadas
     return text.strip()
 
-def detect_signature_regions(image):
+def detect_signature_regions(image, pyramid_levels=0):
     """
     Detecta regiones que probablemente contengan firmas usando procesamiento de imágenes.
+    Acepta una imagen PIL o un arreglo de grises (por ejemplo ParsedDocument.gray_array).
+    Solo la usan extract_signatures_from_image (sin llamadores) y bench-signatures; la
+    validación de firmas mide tinta con ParsedDocument.ink_map.
     """
-    # Convertir imagen PIL a formato OpenCV
-    img_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-    gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-    
-    # Aplicar umbral adaptativo
-    thresh = cv2.adaptiveThreshold(
-        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-        cv2.THRESH_BINARY_INV, 11, 2
-    )
-    
-    # Encontrar contornos
-    contours, _ = cv2.findContours(
-        thresh, cv2.RETR_EXTERNAL, 
-        cv2.CHAIN_APPROX_SIMPLE
-    )
-    
-    signature_regions = []
-    for contour in contours:
-        x, y, w, h = cv2.boundingRect(contour)
-        
-        # Filtrar por tamaño y proporción
-        area = w * h
-        aspect_ratio = w / float(h)
-        
-        if (area > 5000 and  # Área mínima
-            area < 50000 and  # Área máxima
-            aspect_ratio > 1.5 and  # Más ancho que alto
-            aspect_ratio < 4):  # No demasiado alargado
-            
-            # Expandir región para incluir texto cercano
-            expanded_region = {
-                "left": max(0, x - 20),
-                "top": max(0, y - 20),
-                "width": min(w + 40, image.width - x),
-                "height": min(h + 40, image.height - y)
-            }
-            signature_regions.append(expanded_region)
-    
-    return signature_regions
+    from image_buffer import to_gray_array
+    import signature_detection
+
+    return signature_detection.detect_signature_regions(to_gray_array(image), pyramid_levels=pyramid_levels)
 
 def extract_signature_info(image, signature_region):
     """
@@ -263,9 +225,13 @@ def extract_signature_info(image, signature_region):
 
 def extract_signatures_from_image(image):
     """
-    Detecta y extrae información de todas las firmas en una imagen.
+    Detecta y extrae información de todas las firmas en una imagen (PIL o arreglo de grises).
+    No forma parte del procesamiento de documentos (process.py la importa pero no la llama).
     """
     signature_regions = detect_signature_regions(image)
+    if signature_regions and not isinstance(image, Image.Image):
+        from image_buffer import to_pil
+        image = to_pil(image)  # El OCR de las regiones necesita una imagen PIL
     signatures = []
     
     for region in signature_regions:
@@ -275,42 +241,42 @@ def extract_signatures_from_image(image):
     
     return signatures
 
-def extract_text_from_pdf(file_path):
+def extract_text_from_pdf(document):
     """
     Extrae texto directamente del PDF usando PyMuPDF.
+    Las páginas sin capa de texto (escaneadas) se reconocen con OCR; en las páginas
+    mixtas se lee la capa de texto y se reconocen solo las imágenes sin texto encima.
     """
     try:
-        doc = fitz.open(file_path)
+        kinds = [document.page_classification(page_num)["kind"] for page_num in range(document.page_count)]
+        if all(kind == "text" for kind in kinds):
+            return document.text
+
         text = ""
-        for page in doc:
-            text += page.get_text()
-        doc.close()
+        for page_num, kind in enumerate(kinds):
+            if kind == "image":
+                if page_mode_enabled():
+                    # Mismo OCR de página que usan los recuadros de firma
+                    text += document.page_ocr(page_num, OCR_DPI, PAGE_OCR_LANG).text() + "\n"
+                else:
+                    text += ocr_cache.image_to_string(document.render_page(page_num, dpi=OCR_DPI), lang="eng")
+                continue
+            text += document.page_text(page_num)
+            for region in document.page_classification(page_num)["ocr_regions"]:
+                image = document.render_page(page_num, dpi=OCR_DPI, clip=region)
+                text += ocr_cache.image_to_string(image, lang="eng") + "\n"
         return text.strip()
     except Exception as e:
-        raise ValueError(f"Error al extraer texto del PDF {file_path}: {e}")
+        raise ValueError(f"Error al extraer texto del PDF {document.file_path}: {e}")
 
-def extract_images_from_pdf(pdf_path):
+def extract_images_from_pdf(document):
     """
     Extrae imágenes incrustadas de un PDF.
     """
-    images = []
     try:
-        doc = fitz.open(pdf_path)
-        for page_num in range(doc.page_count):
-            page = doc.load_page(page_num)
-            for img_index, img in enumerate(page.get_images(full=True)):
-                xref = img[0]
-                base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                images.append({
-                    "page": page_num + 1,
-                    "index": img_index + 1,
-                    "image": Image.open(io.BytesIO(image_bytes))
-                })
-        doc.close()
+        return document.embedded_images()
     except Exception as e:
-        raise ValueError(f"Error extrayendo imágenes del PDF {pdf_path}: {e}")
-    return images
+        raise ValueError(f"Error extrayendo imágenes del PDF {document.file_path}: {e}")
 
 def extract_section_from_pdf(text, start_marker, end_marker=None):
     """
@@ -322,23 +288,61 @@ def extract_section_from_pdf(text, start_marker, end_marker=None):
         return None
     return text[start_idx:end_idx].strip()
 
-def extract_text_near_signature(image, position_index):
+def region_box(region):
+    """
+    Convierte una región del esquema {"top", "left", "width", "height"} en (left, top, right, bottom).
+    """
+    return (region["left"], region["top"], region["left"] + region["width"], region["top"] + region["height"])
+
+def placement_box(placement, region):
+    """
+    Convierte una región en píxeles de una imagen incrustada (como las regiones de firma
+    del esquema) en coordenadas de página, usando el rectángulo donde se dibuja la imagen
+    y su tamaño en píxeles. Devuelve None si la imagen no se dibuja en la página o si la
+    región queda fuera de ella.
+    """
+    bbox = placement.get("bbox")
+    if bbox is None or not placement.get("width") or not placement.get("height"):
+        return None
+    scale_x = bbox.width / placement["width"]
+    scale_y = bbox.height / placement["height"]
+    left, top, right, bottom = region_box(region)
+    left, top = max(left, 0), max(top, 0)
+    right, bottom = min(right, placement["width"]), min(bottom, placement["height"])
+    if right <= left or bottom <= top:
+        return None
+    return (bbox.x0 + left * scale_x, bbox.y0 + top * scale_y,
+            bbox.x0 + right * scale_x, bbox.y0 + bottom * scale_y)
+
+def render_signature_region(document, page_num, box):
     """
-    Extrae texto de una región cercana a una firma en la imagen.
+    Renderiza solo el recuadro de la firma (coordenadas de página) a la resolución de OCR.
     """
-    signature_regions = [
-        (50, 600, 450, 900),  # Región ampliada para la primera firma
-        (500, 600, 850, 900)  # Región ampliada para la segunda firma
-    ]
+    return document.render_page(page_num, dpi=OCR_DPI, grayscale=True, clip=box)
 
+def extract_text_near_signature(document, page_num, box):
+    """
+    Extrae el texto del recuadro de una firma (coordenadas de página).
+    Si la página tiene capa de texto se lee directamente. Si no, en modo página se consulta
+    el OCR completo de la página (compartido con extract_text_from_pdf); en modo región se
+    renderiza solo el recuadro y se reconoce con OCR.
+    """
     try:
-        region = signature_regions[position_index]
-        cropped_region = image.crop(region)
+        text = document.region_text(page_num, box)
+        if text:
+            return text
+
+        if page_mode_enabled() and document.page_classification(page_num)["kind"] == "image":
+            scale = OCR_DPI / 72
+            page_ocr = document.page_ocr(page_num, OCR_DPI, PAGE_OCR_LANG)
+            return page_ocr.text_in(*(value * scale for value in box)).strip()
+
+        image = render_signature_region(document, page_num, box)
         config = '--psm 6'  # Suposición de texto por bloques
-        text = pytesseract.image_to_string(cropped_region, lang="eng+spa", config=config)
+        text = ocr_region(image, (0, 0, image.width, image.height), lang="eng+spa", config=config)
         return text.strip()
     except Exception as e:
-        print(f"Error al extraer texto cerca de la firma en la posición {position_index}: {str(e)}")
+        print(f"Error al extraer texto cerca de la firma en la página {page_num + 1}: {str(e)}")
         return ""
 
 # Services delivery record
@@ -349,23 +353,20 @@ def normalize_text(text):
     print("Texto normalizado:", normalized)
     return normalized
 
-def extract_invoice_data(pdf_path):
+def extract_invoice_data(document):
     extracted_data = {}
 
     try:
-        doc = fitz.open(pdf_path)
+        blocks = document.block_index(0)
 
         # Bloque 1: Información de la empresa
-        page = doc[0]
-        company_block = page.get_text("blocks")
-        company_text = " ".join(block[4] for block in company_block if block[1] < 200)
+        company_text = blocks.band_text(y_max=200)
         #fix: print("Texto de la empresa:", company_text)
         company_data = extract_company_info(company_text)
         extracted_data.update(company_data)
 
         # Bloque 2: Información de la factura
-        invoice_block = page.get_text("blocks")
-        invoice_text = " ".join(block[4] for block in invoice_block if 200 < block[1] < 350)
+        invoice_text = blocks.band_text(200, 350)
         #fix: done print("Texto de la factura:", invoice_text)
         invoice_data = extract_invoice_info(invoice_text)  # Extraer datos de la factura
         extracted_data.update(invoice_data)
@@ -375,22 +376,19 @@ def extract_invoice_data(pdf_path):
             raise ValueError("No se pudo extraer el número de orden (order_number).")
 
         # Bloque 3: Información del cliente
-        client_block = page.get_text("blocks")
-        client_text = " ".join(block[4] for block in client_block if 220 < block[1] < 400)
+        client_text = blocks.band_text(220, 400)
         #fix: print("Texto del cliente:", client_text)
         client_data = extract_client_info(client_text, order_number)  # Pasar `order_number`
         extracted_data.update(client_data)
 
         # Bloque 4: Tabla de servicios
-        total_block = page.get_text("blocks")
-        total_text = " ".join(block[4] for block in total_block if block[1] > 400)
+        total_text = blocks.band_text(y_min=400)
         #fix: print("Texto de tablas:", total_text)
         table_data = extract_table_info(total_text)
         extracted_data.update(table_data)
 
         # Bloque 5: Totales
-        total_block = page.get_text("blocks")
-        total_text = " ".join(block[4] for block in total_block if block[1] > 450)
+        total_text = blocks.band_text(y_min=450)
         #fix: Descomentar linea print("Texto de totales:", total_text)
         extracted_data.update(extract_totals(total_text))
 
@@ -1,84 +1,267 @@
-import torch
 import os
-import json
 import sys
+import json
+import time
+import subprocess
 
-from process import process_single_document
-from model import DocumentDataset
-from model import train_single_fold
-from config import debug_tesseract, test_tesseract
+# Punto de entrada de la IA. La inferencia (ia.py <archivo> <tipo> <ruc> <auxiliar> [auxiliar_hes])
+# solo importa lo necesario para procesar el documento; torch, el modelo y las
+# pruebas de Tesseract quedan detrás de los subcomandos train y diagnose.
+
+USAGE = """Uso:
+  ia.py <archivo> <tipo_documento> <ruc> <auxiliar> [auxiliar_hes]
+  ia.py serve [--no-warmup]
+  ia.py batch <manifiesto.csv|.ndjson> [--output resultados.ndjson] [--workers N] [--chunksize N]
+  ia.py train [--folds K] [--types Invoice,Contract,...] [--workers N] [--seed S] [--embeddings] [--resume]
+  ia.py diagnose
+  ia.py coldstart <archivo> [tipo_documento] [--budget segundos]
+  ia.py bench-ocr <imagen> [--repeat N]
+  ia.py bench-signatures [--repeat N]
+  ia.py bench-train [--batch-size N] [--steps N] [--threads N]
+  ia.py predict <archivo> [<archivo> ...] [--model tipo] [--int8]
+  ia.py export-model <tipo> [--onnx] [--int8]
+  ia.py quant-report <tipo> [--batch-size N]"""
+
+# Módulos que la inferencia de una factura PDF no debe cargar
+HEAVY_MODULES = ["torch", "torchvision", "cv2", "camelot", "model"]
+
+def run_inference(args):
+    import config  # Configura la ruta de Tesseract
+    from process import process_single_document
+
+    file_path = args[0]
+    document_type = args[1]
+    ruc_input = args[2]
+    auxiliar_input = args[3]
+
+    auxiliar_hes_input = args[4] if len(args) == 5 else None
+
+    if auxiliar_hes_input:
+        print(f"Procesando documento {file_path} de tipo {document_type} con RUC {ruc_input}, auxiliar {auxiliar_input} y auxiliar HES {auxiliar_hes_input}")
+        result = process_single_document(file_path, document_type, ruc_input, auxiliar_input, auxiliar_hes_input)
+    else:
+        result = process_single_document(file_path, document_type, ruc_input, auxiliar_input)
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+def run_serve(args):
+    import config
+    from worker import serve
+
+    serve(warmup="--no-warmup" not in args)
+
+def run_batch_command(args):
+    from batch import run_batch
+
+    options = {"--output": None, "--workers": None, "--chunksize": "4"}
+    positional = []
+    index = 0
+    while index < len(args):
+        if args[index] in options:
+            options[args[index]] = args[index + 1]
+            index += 2
+        else:
+            positional.append(args[index])
+            index += 1
+
+    if not positional:
+        print(USAGE)
+        sys.exit(2)
+
+    run_batch(
+        positional[0],
+        output_path=options["--output"],
+        workers=int(options["--workers"]) if options["--workers"] else None,
+        chunksize=int(options["--chunksize"]),
+    )
+
+def run_diagnose(args):
+    from config import debug_tesseract, test_tesseract
 
-if __name__ == "__main__":
     debug_tesseract()
     test_tesseract()
 
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-
-    if len(sys.argv) >= 5:  
-        file_path = sys.argv[1]
-        document_type = sys.argv[2]
-        ruc_input = sys.argv[3]
-        auxiliar_input = sys.argv[4]
-        
-        auxiliar_hes_input = sys.argv[5] if len(sys.argv) == 6 else None
-        
-        if auxiliar_hes_input:
-            print(f"Procesando documento {file_path} de tipo {document_type} con RUC {ruc_input}, auxiliar {auxiliar_input} y auxiliar HES {auxiliar_hes_input}")
-            result = process_single_document(file_path, document_type, ruc_input, auxiliar_input, auxiliar_hes_input)
-        else:
-            result = process_single_document(file_path, document_type, ruc_input, auxiliar_input)
-        
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+def coldstart_report(file_path, document_type="Invoice"):
+    """
+    Procesa file_path en un proceso nuevo y devuelve los tiempos de arranque en frío y los
+    módulos pesados (HEAVY_MODULES) que quedaron cargados.
+    """
+    probe = (
+        "import sys, json, time\n"
+        "from contextlib import redirect_stdout\n"
+        "start = time.perf_counter()\n"
+        "with redirect_stdout(sys.stderr):\n"
+        "    import config\n"
+        "    from process import process_single_document\n"
+        "    import_time = time.perf_counter() - start\n"
+        "    process_single_document(sys.argv[1], sys.argv[2], '', '')\n"
+        "total_time = time.perf_counter() - start\n"
+        "heavy = [name for name in json.loads(sys.argv[3]) if name in sys.modules]\n"
+        "print(json.dumps({'import_time': import_time, 'total_time': total_time, 'heavy_modules': heavy}))\n"
+    )
 
-    else:
-        print(f"Procesando documento ")
-        learning_dir = os.path.join(os.path.dirname(__file__), 'learning')
-        os.makedirs(learning_dir, exist_ok=True)
+    start_time = time.time()
+    completed = subprocess.run(
+        [sys.executable, "-c", probe, os.path.abspath(file_path), document_type, json.dumps(HEAVY_MODULES)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    wall_time = time.time() - start_time
+
+    if completed.returncode != 0:
+        raise RuntimeError(f"El arranque en frío falló:\n{completed.stderr}")
+
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    report.update({"wall_time": wall_time, "document_type": document_type})
+    return report
+
+def run_coldstart(args):
+    """
+    Mide el arranque en frío de la inferencia. Falla si se cargan módulos pesados o, con
+    --budget, si el tiempo total supera el presupuesto.
+    """
+    budget = None
+    if "--budget" in args:
+        budget_index = args.index("--budget")
+        budget = float(args[budget_index + 1])
+        args = args[:budget_index] + args[budget_index + 2:]
+
+    if not args:
+        print(USAGE)
+        sys.exit(2)
+
+    try:
+        report = coldstart_report(args[0], args[1] if len(args) > 1 else "Invoice")
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
+
+    report["budget"] = budget
+    report["passed"] = not report["heavy_modules"] and (budget is None or report["wall_time"] <= budget)
+    print(json.dumps(report, indent=2))
+
+    if not report["passed"]:
+        print(f"Arranque en frío fuera de presupuesto ({report['wall_time']:.2f}s, presupuesto {budget}) o con módulos pesados: {report['heavy_modules']}", file=sys.stderr)
+        sys.exit(1)
+
+def run_bench_ocr(args):
+    import config
+    from ocr_engine import benchmark
+
+    repeat = 10
+    if "--repeat" in args:
+        repeat_index = args.index("--repeat")
+        repeat = int(args[repeat_index + 1])
+        args = args[:repeat_index] + args[repeat_index + 2:]
 
-        data_dir = os.path.join(os.path.dirname(__file__), 'data', 'train')
-        current_fold = 1
+    if not args:
+        print(USAGE)
+        sys.exit(2)
 
-        while True:
-            try:
-                for doc_type in ["Invoice", "ServiceDeliveryRecord", "Contract"]:
-                    model_path = os.path.join(learning_dir, f'model_fold_{doc_type.lower()}{current_fold}.pth')
+    print(json.dumps(benchmark(args[0], repeat=repeat), indent=2))
 
-                    if os.path.exists(model_path):
-                        print(f"Modelo {doc_type} para fold {current_fold} ya existe, saltando...")
-                        continue
+def run_bench_signatures(args):
+    from signature_detection import benchmark
 
-                    print(f"\nIniciando entrenamiento para {doc_type} - Fold {current_fold}")
+    repeat = 3
+    if "--repeat" in args:
+        repeat = int(args[args.index("--repeat") + 1])
 
-                    dataset_path = os.path.join(data_dir, doc_type.lower())
+    print(json.dumps(benchmark(repeat=repeat), indent=2))
 
-                    valid_files = []
-                    for root, dirs, files in os.walk(dataset_path):
-                        for file in files:
-                            if doc_type == "Invoice" and file.startswith("invoice_") and file.endswith((".pdf", ".png", ".xml")):
-                                valid_files.append(os.path.join(root, file))
-                            elif doc_type == "ServiceDeliveryRecord" and file.startswith("delivery_") and file.endswith((".pdf", ".png", ".xml")):
-                                valid_files.append(os.path.join(root, file))
-                            elif doc_type == "Contract" and file.startswith("contract_") and file.endswith((".pdf", ".xml")):
-                                valid_files.append(os.path.join(root, file))
+def run_bench_training(args):
+    from training_engine import benchmark
 
-                    if not valid_files:
-                        raise ValueError(f"No se encontraron archivos válidos para {doc_type} en {dataset_path}")
+    options = {"--batch-size": 16, "--steps": 10, "--threads": None}
+    for option in options:
+        if option in args:
+            options[option] = int(args[args.index(option) + 1])
 
-                    print(f"Cargando {len(valid_files)} documentos desde: {dataset_path}")
-                    dataset = DocumentDataset(file_paths=valid_files, document_type=doc_type)
+    report = benchmark(batch_size=options["--batch-size"], steps=options["--steps"], threads=options["--threads"])
+    print(json.dumps(report, indent=2))
 
-                    print(f"Iniciando entrenamiento con {len(dataset)} documentos de tipo {doc_type}")
-                    train_single_fold(dataset, learning_dir, doc_type, current_fold, device)
+def run_predict(args):
+    from concurrent.futures import ThreadPoolExecutor
+    from inference import MicroBatcher, load_model, quantize_dynamic, ImageModel
 
-                print(f"\nFold {current_fold} completado para todos los tipos de documentos!")
-                response = input("\n¿Desea continuar con otro fold? (s/n): ").lower()
-                if response not in ['s', 'si', 'yes', 'y']:
-                    print("Entrenamiento detenido por el usuario")
-                    break
-                current_fold += 1
+    model_type = "Invoice"
+    if "--model" in args:
+        model_index = args.index("--model")
+        model_type = args[model_index + 1]
+        args = args[:model_index] + args[model_index + 2:]
+    use_int8 = "--int8" in args
+    files = [arg for arg in args if arg != "--int8"]
+    if not files:
+        print(USAGE)
+        sys.exit(2)
 
-            except Exception as e:
-                print(f"Error durante el entrenamiento: {str(e)}")
-                break
+    model = load_model(model_type)
+    batcher = MicroBatcher(quantize_dynamic(model) if use_int8 else ImageModel(model).eval())
+    try:
+        with ThreadPoolExecutor(max_workers=min(8, len(files))) as executor:
+            predictions = dict(zip(files, executor.map(batcher.predict, files)))
+    finally:
+        batcher.close()
+    print(json.dumps(predictions, indent=2))
 
-        print("\nEntrenamiento finalizado!")
+def run_export_model(args):
+    from inference import export_model
+
+    if not args:
+        print(USAGE)
+        sys.exit(2)
+    print(json.dumps(export_model(args[0], onnx="--onnx" in args, quantized="--int8" in args), indent=2))
+
+def run_quant_report(args):
+    from inference import quantization_report
+
+    if not args:
+        print(USAGE)
+        sys.exit(2)
+    batch_size = int(args[args.index("--batch-size") + 1]) if "--batch-size" in args else 8
+    print(json.dumps(quantization_report(args[0], batch_size=batch_size), indent=2))
+
+def run_training(args):
+    from orchestrator import run_kfold, DOCUMENT_TYPES
+
+    options = {"--folds": "5", "--types": ",".join(DOCUMENT_TYPES), "--workers": "1", "--seed": "0"}
+    for option in options:
+        if option in args:
+            options[option] = args[args.index(option) + 1]
+
+    summary = run_kfold(
+        num_folds=int(options["--folds"]),
+        doc_types=[doc_type for doc_type in options["--types"].split(",") if doc_type],
+        workers=int(options["--workers"]),
+        seed=int(options["--seed"]),
+        use_embeddings="--embeddings" in args,
+        resume="--resume" in args,
+    )
+    failed = [key for key, fold in summary["folds"].items() if fold["status"] == "error"]
+    print(f"\nEntrenamiento finalizado en {summary['wall_time']:.1f}s ({len(summary['folds'])} folds, {len(failed)} con error)")
+    if failed:
+        sys.exit(1)
+
+COMMANDS = {
+    "serve": run_serve,
+    "batch": run_batch_command,
+    "train": run_training,
+    "diagnose": run_diagnose,
+    "coldstart": run_coldstart,
+    "bench-ocr": run_bench_ocr,
+    "bench-signatures": run_bench_signatures,
+    "bench-train": run_bench_training,
+    "predict": run_predict,
+    "export-model": run_export_model,
+    "quant-report": run_quant_report,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] in COMMANDS:
+        COMMANDS[sys.argv[1]](sys.argv[2:])
+    elif len(sys.argv) >= 5:
+        run_inference(sys.argv[1:])
+    else:
+        print(USAGE)
+        sys.exit(2)
@@ -0,0 +1,42 @@
+import numpy as np
+from PIL import Image
+
+# Buffers de imagen para las rutas de OpenCV. Un pixmap de PyMuPDF renderizado en escala
+# de grises se envuelve como vista de NumPy sobre pix.samples_mv, sin copiar los píxeles;
+# la conversión a PIL se hace solo cuando un consumidor (OCR, recortes) la necesita.
+#
+# La vista comparte memoria con el pixmap: el pixmap debe seguir vivo mientras se use
+# (ParsedDocument los conserva en su caché hasta close()).
+
+def pixmap_array(pix):
+    """
+    Vista (alto, ancho) o (alto, ancho, canales) de NumPy sobre los píxeles del pixmap.
+    """
+    samples = getattr(pix, "samples_mv", None)
+    if samples is None:
+        samples = pix.samples  # Versiones antiguas de PyMuPDF: copia como bytes
+    rows = np.frombuffer(samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+    pixels = rows[:, :pix.width * pix.n]
+    if pix.n == 1:
+        return pixels
+    return pixels.reshape(pix.height, pix.width, pix.n)
+
+def to_gray_array(image):
+    """
+    Arreglo 2D uint8 en escala de grises a partir de un arreglo de NumPy o de una imagen PIL.
+    Los arreglos que ya son de un canal se devuelven tal cual.
+    """
+    if isinstance(image, np.ndarray):
+        if image.ndim == 2:
+            return image
+        import cv2
+        return cv2.cvtColor(image, cv2.COLOR_RGBA2GRAY if image.shape[2] == 4 else cv2.COLOR_RGB2GRAY)
+    if image.mode != "L":
+        image = image.convert("L")
+    return np.asarray(image)
+
+def to_pil(array):
+    """
+    Imagen PIL a partir de un arreglo de grises o RGB.
+    """
+    return Image.fromarray(np.ascontiguousarray(array))
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import queue
+import threading
+import statistics
+from concurrent.futures import Future
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from model import DocumentCNN, get_best_model_path, LEARNING_DIR
+from tensor_cache import load_sample_image, IMAGE_SIZE
+
+# Inferencia en CPU de DocumentCNN: carga del mejor fold (pesos con mmap), exportación a
+# TorchScript/ONNX, cuantización int8 y un servidor de micro-lotes que agrupa las
+# solicitudes concurrentes en un solo forward. Solo documentos de imagen (PDF o PNG).
+
+DOCUMENT_TYPES = ["Invoice", "ServiceDeliveryRecord", "Contract"]
+
+def load_state_dict(model_path):
+    try:
+        return torch.load(model_path, map_location="cpu", mmap=True, weights_only=True)
+    except TypeError:
+        # Versiones de torch sin mmap/weights_only
+        return torch.load(model_path, map_location="cpu")
+
+# Claves que pueden sobrar en checkpoints guardados mientras la cabeza tabular vivía
+# dentro de DocumentCNN; la inferencia de imágenes no las usa.
+LEGACY_PREFIXES = ("tabular_head.",)
+
+def load_model(document_type=None, model_path=None):
+    """
+    DocumentCNN en modo evaluación con los pesos del mejor fold de document_type.
+    Acepta checkpoints del formato original y los que incluyen la cabeza tabular.
+    """
+    model_path = model_path or get_best_model_path(document_type)
+    model = DocumentCNN(num_classes=len(DOCUMENT_TYPES))
+    result = model.load_state_dict(load_state_dict(model_path), strict=False)
+    unexpected = [key for key in result.unexpected_keys if not key.startswith(LEGACY_PREFIXES)]
+    if result.missing_keys or unexpected:
+        raise RuntimeError(
+            f"El checkpoint {model_path} no corresponde a DocumentCNN "
+            f"(faltan: {result.missing_keys}, sobran: {unexpected})"
+        )
+    model.eval()
+    return model
+
+def preprocess(file_path):
+    """Tensor (3, 400, 400) float32 de la primera página del PDF o del PNG."""
+    array = np.asarray(load_sample_image(file_path, IMAGE_SIZE))
+    return torch.from_numpy(array).permute(2, 0, 1).float().div_(255)
+
+class ImageModel(nn.Module):
+    """Solo la ruta de imágenes de DocumentCNN, para exportar con forma fija."""
+    def __init__(self, model):
+        super(ImageModel, self).__init__()
+        self.backbone = model.backbone
+        self.classifier = model.classifier
+
+    def forward(self, x):
+        return self.classifier(torch.flatten(self.backbone(x), 1))
+
+def export_torchscript(model, output_path):
+    example = torch.rand(1, 3, IMAGE_SIZE, IMAGE_SIZE)
+    with torch.no_grad():
+        scripted = torch.jit.trace(ImageModel(model).eval(), example)
+        scripted = torch.jit.freeze(scripted)
+    scripted.save(output_path)
+    return output_path
+
+def export_onnx(model, output_path):
+    example = torch.rand(1, 3, IMAGE_SIZE, IMAGE_SIZE)
+    torch.onnx.export(
+        ImageModel(model).eval(), example, output_path,
+        input_names=["image"], output_names=["logits"],
+        dynamic_axes={"image": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=17,
+    )
+    return output_path
+
+def quantize_dynamic(model):
+    """int8 dinámico: pesos de las capas lineales cuantizados, activaciones en float."""
+    return torch.ao.quantization.quantize_dynamic(ImageModel(model).eval(), {nn.Linear}, dtype=torch.qint8)
+
+def quantize_static(model, calibration_batches):
+    """
+    int8 estático (FX) calibrado con lotes de ejemplo. Si el grafo no se puede cuantizar
+    se usa la cuantización dinámica.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    try:
+        float_model = ImageModel(model).eval()
+        example = (calibration_batches[0],)
+        prepared = prepare_fx(float_model, get_default_qconfig_mapping("x86"), example)
+        with torch.no_grad():
+            for batch in calibration_batches:
+                prepared(batch)
+        return convert_fx(prepared)
+    except Exception as e:
+        print(f"Cuantización estática no disponible, se usa la dinámica: {str(e)}")
+        return quantize_dynamic(model)
+
+class MicroBatcher:
+    """
+    Agrupa predicciones concurrentes: espera hasta max_wait_ms o max_batch solicitudes y
+    las resuelve con un solo forward.
+    """
+    def __init__(self, model, max_batch=8, max_wait_ms=10):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, tensor):
+        future = Future()
+        self._queue.put((tensor, future))
+        return future
+
+    def predict(self, file_path):
+        """Tipo de documento y probabilidades de un archivo."""
+        return self.submit(preprocess(file_path)).result()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+
+            try:
+                with torch.no_grad():
+                    probabilities = torch.softmax(self.model(torch.stack([tensor for tensor, _ in batch])), dim=1)
+                for (_, future), row in zip(batch, probabilities):
+                    future.set_result({
+                        "document_type": DOCUMENT_TYPES[int(row.argmax())],
+                        "probabilities": dict(zip(DOCUMENT_TYPES, row.tolist())),
+                    })
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+def validation_samples(document_type, learning_dir=LEARNING_DIR):
+    """
+    Archivos de validación (val_files) del mejor fold y su etiqueta.
+    """
+    model_path = get_best_model_path(document_type, learning_dir)
+    results_path = model_path.replace("model_fold_", "training_results_").replace(".pth", ".json")
+    with open(results_path, 'r') as f:
+        val_files = json.load(f).get("val_files", [])
+    val_files = [path for path in val_files if path.endswith(('.pdf', '.png'))]
+    return model_path, val_files, DOCUMENT_TYPES.index(document_type)
+
+def measure(model, inputs, labels, batch_size):
+    latencies = []
+    correct = 0
+    with torch.no_grad():
+        for start in range(0, len(inputs), batch_size):
+            batch = inputs[start:start + batch_size]
+            start_time = time.perf_counter()
+            outputs = model(batch)
+            latencies.append((time.perf_counter() - start_time) * 1000 / len(batch))
+            correct += int((outputs.argmax(dim=1) == labels[start:start + batch_size]).sum())
+    return {
+        "accuracy": correct / len(inputs) if len(inputs) else 0.0,
+        "mean_ms_per_image": statistics.mean(latencies) if latencies else 0.0,
+        "median_ms_per_image": statistics.median(latencies) if latencies else 0.0,
+    }
+
+def quantization_report(document_type, batch_size=8, calibration_size=32, learning_dir=LEARNING_DIR):
+    """
+    Latencia y exactitud fp32 frente a int8 (dinámico y estático) sobre la validación del mejor fold.
+    """
+    model_path, val_files, label = validation_samples(document_type, learning_dir)
+    if not val_files:
+        raise ValueError(f"El fold {model_path} no tiene archivos de validación de imagen")
+
+    model = load_model(model_path=model_path)
+    inputs = torch.stack([preprocess(path) for path in val_files])
+    labels = torch.full((len(val_files),), label, dtype=torch.long)
+    calibration = list(torch.split(inputs[:calibration_size], batch_size))
+
+    fp32_model = ImageModel(model).eval()
+    report = {
+        "model_path": model_path,
+        "samples": len(val_files),
+        "fp32": measure(fp32_model, inputs, labels, batch_size),
+        "int8_dynamic": measure(quantize_dynamic(model), inputs, labels, batch_size),
+        "int8_static": measure(quantize_static(model, calibration), inputs, labels, batch_size),
+    }
+    return report
+
+def export_model(document_type, output_dir=None, onnx=False, quantized=False):
+    """
+    Exporta el mejor fold a TorchScript (opcionalmente int8 dinámico) y, si se pide, a ONNX.
+    """
+    output_dir = output_dir or os.path.join(LEARNING_DIR, "export")
+    os.makedirs(output_dir, exist_ok=True)
+    model = load_model(document_type)
+    name = document_type.lower()
+    exported = {"torchscript": export_torchscript(model, os.path.join(output_dir, f"{name}.pt"))}
+    if quantized:
+        int8_model = quantize_dynamic(model)
+        int8_path = os.path.join(output_dir, f"{name}_int8.pt")
+        torch.jit.save(torch.jit.trace(int8_model, torch.rand(1, 3, IMAGE_SIZE, IMAGE_SIZE)), int8_path)
+        exported["torchscript_int8"] = int8_path
+    if onnx:
+        exported["onnx"] = export_onnx(model, os.path.join(output_dir, f"{name}.onnx"))
+    return exported
@@ -5,21 +5,27 @@ import torch.nn as nn
 from PIL import Image
 import torchvision
 from torchvision import transforms as T
-from torch.utils.data import DataLoader, Dataset, SubsetRandomSampler
+from torch.utils.data import DataLoader, Dataset, Subset, SubsetRandomSampler
 from torch.optim.lr_scheduler import ReduceLROnPlateau
 import numpy as np
 
-from utils import load_document_schema, convert_pdf_to_images
+from utils import load_document_schema, iter_pdf_images
+from tabular import TabularFeatures, TABULAR_FEATURES
+from training_engine import DeviceStrategy
+from training_state import atomic_save, capture_rng_state, restore_rng_state, load_training_state, CheckpointSchedule
+from training_metrics import PhaseTimer, StepProfiler, epoch_metrics
 
 class DocumentDataset(Dataset):
-    def __init__(self, file_paths, document_type, transforms=None):
+    def __init__(self, file_paths, document_type, transforms=None, cache_dir=None, update_cache=True):
         self.file_paths = file_paths
         self.transforms = transforms
         self.document_type = document_type
+        self.cache = None
         self.schema = load_document_schema()[document_type]["fields"]
 
         self.num_classes = 3
         self.field_names = list(self.schema.keys())
+        self.tabular = TabularFeatures(self.field_names)
 
         print(f"Inicializando Dataset para {document_type}")
         print(f"Campos del schema: {self.field_names}")
@@ -37,27 +43,34 @@ class DocumentDataset(Dataset):
         elif document_type == "Contract":
             self.label = 2
 
+        if cache_dir:
+            from tensor_cache import TensorCache
+            self.cache = TensorCache(cache_dir, document_type)
+            # Sin update_cache solo se lee el caché (workers del orquestador: ya lo llenó
+            # prepare_caches y no debe escribirse desde varios procesos a la vez)
+            if update_cache:
+                self.cache.update(self.file_paths, self.label)
+
     def __len__(self):
         return len(self.file_paths)
 
     def __getitem__(self, idx):
         file_path = self.file_paths[idx]
         try:
+            row = self.cache.row(file_path) if self.cache else None
+            if row is not None:
+                # Vista uint8 (canales, alto, ancho) sobre el caché; custom_collate la pasa a float
+                image = torch.from_numpy(self.cache.sample(row)).permute(2, 0, 1)
+                if self.transforms:
+                    image = self.transforms(image)
+                return image, torch.tensor(self.label, dtype=torch.long)
+
             if file_path.endswith('.pdf'):
-                image = convert_pdf_to_images(file_path)[0]  
+                image = next(iter_pdf_images(file_path, pages=[0]))
             elif file_path.endswith('.png'):
                 image = Image.open(file_path).convert('RGB')  
             elif file_path.endswith('.xml'):
-                import xml.etree.ElementTree as ET
-                tree = ET.parse(file_path)
-                root = tree.getroot()
-                data_vector = torch.zeros(10)  
-                for i, field in enumerate(self.field_names[:10]): 
-                    value = root.find(field).text if root.find(field) is not None else 0
-                    try:
-                        data_vector[i] = float(value)
-                    except ValueError:
-                        data_vector[i] = 0
+                data_vector = torch.from_numpy(self.tabular.parse(file_path))
                 return data_vector, torch.tensor(self.label, dtype=torch.long)
 
             image = image.resize((400, 400), Image.Resampling.LANCZOS)
@@ -101,9 +114,42 @@ class EarlyStopping:
     def save_checkpoint(self, val_loss, model, path):
         if self.verbose:
             print(f'Validation loss decreased ({self.val_loss_min:.6f} --> {val_loss:.6f}). Saving model ...')
-        torch.save(model.state_dict(), path)
+        if hasattr(model, "save"):
+            model.save(path)
+        else:
+            atomic_save(model.state_dict(), path)
         self.val_loss_min = val_loss
 
+    def state_dict(self):
+        return {
+            "counter": self.counter,
+            "best_loss": self.best_loss,
+            "early_stop": self.early_stop,
+            "val_loss_min": self.val_loss_min,
+        }
+
+    def load_state_dict(self, state):
+        self.counter = state["counter"]
+        self.best_loss = state["best_loss"]
+        self.early_stop = state["early_stop"]
+        self.val_loss_min = state["val_loss_min"]
+
+class TabularHead(nn.Module):
+    """
+    Clasificador pequeño para los vectores de campos de las muestras XML.
+    """
+    def __init__(self, num_features, num_classes):
+        super(TabularHead, self).__init__()
+        self.layers = nn.Sequential(
+            nn.Linear(num_features, 64),
+            nn.ReLU(),
+            nn.Dropout(0.2),
+            nn.Linear(64, num_classes)
+        )
+
+    def forward(self, x):
+        return self.layers(x)
+
 class DocumentCNN(nn.Module):
     def __init__(self, num_classes):
         super(DocumentCNN, self).__init__()
@@ -133,6 +179,38 @@ class DocumentCNN(nn.Module):
             x = x.view(x.size(0), -1)
         return self.classifier(x)
 
+    def classify_embeddings(self, embeddings):
+        """Clasifica embeddings ya calculados del backbone (ver embedding_cache)."""
+        return self.classifier(embeddings)
+
+def tabular_head_path(model_path):
+    """Archivo de la cabeza tabular de un fold, junto a model_fold_<tipo><fold>.pth."""
+    directory, name = os.path.split(model_path)
+    return os.path.join(directory, name.replace("model_fold_", "tabular_fold_", 1))
+
+class FoldModel(nn.Module):
+    """
+    Modelos que se entrenan en un fold: DocumentCNN y, si el fold tiene muestras XML, la
+    cabeza tabular. Cada lote indica su modalidad ("image", "embedding" o "tabular").
+    Se guardan por separado para que model_fold_*.pth mantenga el formato de DocumentCNN.
+    """
+    def __init__(self, image_model, tabular_head=None):
+        super(FoldModel, self).__init__()
+        self.image_model = image_model
+        self.tabular_head = tabular_head
+
+    def forward(self, x, modality="image"):
+        if modality == "tabular":
+            return self.tabular_head(x)
+        if modality == "embedding":
+            return self.image_model.classify_embeddings(x)
+        return self.image_model(x)
+
+    def save(self, model_path):
+        atomic_save(self.image_model.state_dict(), model_path)
+        if self.tabular_head is not None:
+            atomic_save(self.tabular_head.state_dict(), tabular_head_path(model_path))
+
 def custom_collate(batch):
     images = []
     labels = []
@@ -144,7 +222,7 @@ def custom_collate(batch):
             padded_image[:, :10, :10] = vector_as_image
             images.append(padded_image)
         elif len(data.shape) == 3 and data.shape[1:] == (400, 400):
-            images.append(data)
+            images.append(data.float().div_(255) if data.dtype == torch.uint8 else data)
         else:
             print(f"Datos inesperados: {data.shape}")
             continue
@@ -152,95 +230,266 @@ def custom_collate(batch):
 
     return torch.stack(images), torch.tensor(labels)
 
-def train_model(model, train_loader, val_loader, criterion, optimizer, scheduler,
-                device, num_epochs, model_path, patience=15):
-    scaler = torch.cuda.amp.GradScaler()
-    early_stopping = EarlyStopping(patience=patience, verbose=True)
-    val_losses = []
-    train_losses = []
+class TabularDataset(Dataset):
+    def __init__(self, features, labels):
+        self.features = torch.from_numpy(features)
+        self.labels = labels
 
-    for epoch in range(num_epochs):
-        model.train()
-        running_train_loss = 0.0
-        for batch_idx, (inputs, targets) in enumerate(train_loader):
-            inputs = inputs.to(device)
-            targets = targets.to(device)
+    def __len__(self):
+        return len(self.labels)
 
-            with torch.cuda.amp.autocast():
-                outputs = model(inputs)
-                loss = criterion(outputs, targets)
+    def __getitem__(self, idx):
+        return self.features[idx], torch.tensor(self.labels[idx], dtype=torch.long)
 
-            optimizer.zero_grad(set_to_none=True)
-            scaler.scale(loss).backward()
-            scaler.step(optimizer)
-            scaler.update()
-            running_train_loss += loss.item()
+class AlternatingLoader:
+    """
+    Alterna lotes de varios DataLoader hasta agotarlos todos. Recibe pares (modalidad,
+    loader) y entrega (entradas, etiquetas, modalidad) para que el modelo elija la ruta.
+    """
+    def __init__(self, *loaders):
+        self.loaders = [(modality, loader) for modality, loader in loaders if loader is not None]
 
-        model.eval()
-        running_val_loss = 0.0
-        with torch.no_grad():
-            for inputs, targets in val_loader:
-                inputs = inputs.to(device)
-                targets = targets.to(device)
-                outputs = model(inputs)
-                loss = criterion(outputs, targets)
-                running_val_loss += loss.item()
+    def __len__(self):
+        return sum(len(loader) for _, loader in self.loaders)
+
+    def __iter__(self):
+        iterators = [(modality, iter(loader)) for modality, loader in self.loaders]
+        while iterators:
+            for modality, iterator in list(iterators):
+                try:
+                    inputs, targets = next(iterator)
+                except StopIteration:
+                    iterators.remove((modality, iterator))
+                    continue
+                yield inputs, targets, modality
 
-        epoch_train_loss = running_train_loss / len(train_loader)
-        epoch_val_loss = running_val_loss / len(val_loader)
+def train_model(model, train_loader, val_loader, criterion, optimizer, scheduler,
+                device, num_epochs, model_path, patience=15, strategy=None,
+                state_path=None, resume_state=None, checkpoint_schedule=None, extra_state=None,
+                profile_path=None):
+    """
+    Entrena con early stopping. Con state_path guarda periódicamente el estado completo
+    (ver training_state), también a mitad de época con TRAIN_CHECKPOINT_MINUTES;
+    resume_state es un estado cargado desde el que se continúa, en el mismo lote si se
+    guardó a mitad de época.
+    Devuelve también los tiempos por época y fase (ver training_metrics); profile_path
+    es el destino de la traza de torch.profiler si TRAIN_PROFILE_STEPS > 0.
+    """
+    strategy = strategy or DeviceStrategy(device)
+    runner = strategy.prepare_model(model)
+    print(f"Configuración de entrenamiento: {strategy.describe()}")
+    early_stopping = EarlyStopping(patience=patience, verbose=True)
+    checkpoint_schedule = checkpoint_schedule or CheckpointSchedule()
+    val_losses = []
+    train_losses = []
+    epoch_timings = []
+    start_epoch = 0
+    mid_epoch_state = None
+
+    if resume_state is not None:
+        model.load_state_dict(resume_state["model"])
+        optimizer.load_state_dict(resume_state["optimizer"])
+        scheduler.load_state_dict(resume_state["scheduler"])
+        strategy.scaler.load_state_dict(resume_state["scaler"])
+        early_stopping.load_state_dict(resume_state["early_stopping"])
+        val_losses = resume_state["history"]["val_loss"]
+        train_losses = resume_state["history"]["train_loss"]
+        epoch_timings = resume_state["history"].get("timings", [])
+        start_epoch = resume_state["epoch"] + 1
+        restore_rng_state(resume_state["rng"])
+        if resume_state.get("step") is not None:
+            # Guardado a mitad de época: se repite el orden de lotes y se saltan los ya hechos
+            start_epoch = resume_state["epoch"]
+            mid_epoch_state = resume_state
+        print(f"Reanudando desde la época {start_epoch + 1}/{num_epochs}")
+        if early_stopping.early_stop:
+            start_epoch = num_epochs
+
+    def save_state(epoch, step=None, epoch_rng=None, running_train_loss=None):
+        # step = lotes ya entrenados de epoch si se guarda a mitad de época (None al terminarla)
+        atomic_save({
+            "epoch": epoch,
+            "step": step,
+            "epoch_rng": epoch_rng,
+            "running_train_loss": running_train_loss,
+            "model": model.state_dict(),
+            "optimizer": optimizer.state_dict(),
+            "scheduler": scheduler.state_dict(),
+            "scaler": strategy.scaler.state_dict(),
+            "early_stopping": early_stopping.state_dict(),
+            "history": {"val_loss": val_losses, "train_loss": train_losses, "timings": epoch_timings},
+            "rng": capture_rng_state(),
+            **(extra_state or {}),
+        }, state_path)
+        checkpoint_schedule.saved()
+
+    profiler = StepProfiler(profile_path)
+    with profiler:
+        for epoch in range(start_epoch, num_epochs):
+            model.train()
+            running_train_loss = 0.0
+            skip_steps = 0
+            if mid_epoch_state is not None:
+                # El orden de los lotes depende del RNG al iniciar la época
+                restore_rng_state(mid_epoch_state["epoch_rng"])
+                skip_steps = mid_epoch_state["step"]
+                running_train_loss = mid_epoch_state["running_train_loss"]
+                print(f"Saltando {skip_steps} lotes ya entrenados de la época {epoch + 1}")
+            epoch_rng = capture_rng_state()
+            train_timer = PhaseTimer(device)
+            for step, (inputs, targets, *modality) in enumerate(train_timer.iterate(train_loader)):
+                if step < skip_steps:
+                    if step == skip_steps - 1:
+                        restore_rng_state(mid_epoch_state["rng"])
+                    continue
+                with train_timer.timed("host_to_device"):
+                    inputs = strategy.prepare_inputs(inputs)
+                    targets = targets.to(device, non_blocking=True)
+
+                with train_timer.timed("forward"), strategy.autocast():
+                    outputs = runner(inputs, *modality)
+                    loss = criterion(outputs, targets)
+
+                with train_timer.timed("backward"):
+                    strategy.backward(loss, optimizer)
+                with train_timer.timed("optimizer"):
+                    strategy.optimizer_step(optimizer)
+                running_train_loss += loss.item()
+                train_timer.count(len(targets))
+                profiler.step()
+                if state_path and checkpoint_schedule.minutes_due():
+                    save_state(epoch, step + 1, epoch_rng, running_train_loss)
+            mid_epoch_state = None
+
+            model.eval()
+            running_val_loss = 0.0
+            val_timer = PhaseTimer(device)
+            with torch.no_grad():
+                for inputs, targets, *modality in val_timer.iterate(val_loader):
+                    with val_timer.timed("host_to_device"):
+                        inputs = strategy.prepare_inputs(inputs)
+                        targets = targets.to(device, non_blocking=True)
+                    with val_timer.timed("forward"), strategy.autocast():
+                        outputs = runner(inputs, *modality)
+                        loss = criterion(outputs, targets)
+                    running_val_loss += loss.item()
+                    val_timer.count(len(targets))
+
+            epoch_train_loss = running_train_loss / len(train_loader)
+            epoch_val_loss = running_val_loss / len(val_loader)
+
+            train_losses.append(epoch_train_loss)
+            val_losses.append(epoch_val_loss)
+            timings = epoch_metrics(epoch, train_timer, val_timer)
+            epoch_timings.append(timings)
+
+            print(f"Epoch {epoch+1}/{num_epochs}: Train Loss: {epoch_train_loss:.4f}, Val Loss: {epoch_val_loss:.4f}")
+            print(f"  {timings['train']['samples_per_sec']} muestras/s, espera de datos "
+                  f"{timings['train']['data_wait']:.2f}s de {timings['train']['wall_time']:.2f}s, "
+                  f"RSS máx. {timings['peak_rss_mb']} MB")
+
+            scheduler.step(epoch_val_loss)
+
+            early_stopping(epoch_val_loss, model, model_path)
+            if state_path and (early_stopping.early_stop or checkpoint_schedule.due(epoch)):
+                save_state(epoch)
+            if early_stopping.early_stop:
+                print("Early stopping activado!")
+                break
+
+    return {"val_loss": val_losses, "train_loss": train_losses, "timings": epoch_timings}
+
+def kfold_splits(dataset_size, num_folds, seed=0):
+    """
+    Particiones k-fold deterministas: lista de (train_indices, val_indices), una por fold.
+    Cada índice aparece en la validación de exactamente un fold.
+    """
+    permutation = np.random.default_rng(seed).permutation(dataset_size)
+    folds = np.array_split(permutation, num_folds)
+    return [
+        (np.concatenate(folds[:k] + folds[k + 1:]).tolist(), folds[k].tolist())
+        for k in range(num_folds)
+    ]
+
+def train_single_fold(dataset, learning_dir, doc_type, current_fold, device, embedding_cache_dir=None,
+                      split=None, num_workers=4, resume=False):
+    """
+    Entrena un fold. Las muestras XML van por la ruta tabular (lotes propios y cabeza
+    tabular) alternando con los lotes de imágenes. Con embedding_cache_dir el backbone
+    congelado se evalúa una sola vez por archivo (caché de embeddings) y se entrenan
+    solo las cabezas. split = (train_indices, val_indices) fija la partición del fold
+    (ver kfold_splits); sin él se usa un 80/20 aleatorio. Con resume se continúa desde el
+    último estado guardado del fold (state_fold_<tipo><fold>.pt), con su misma partición.
+    """
+    dataset_size = len(dataset)
+    state_path = os.path.join(learning_dir, f'state_fold_{doc_type.lower()}{current_fold}.pt')
+    resume_state = load_training_state(state_path) if resume else None
+    if resume_state is not None and resume_state.get("file_paths") != list(dataset.file_paths):
+        print("Los archivos del fold cambiaron desde el último estado guardado; se entrena desde cero")
+        resume_state = None
+
+    if resume_state is not None:
+        train_indices, val_indices = resume_state["split"]
+    elif split is not None:
+        train_indices, val_indices = split
+    else:
+        indices = list(range(dataset_size))
+        split_point = int(0.8 * dataset_size)
+        np.random.shuffle(indices)
+        train_indices, val_indices = indices[:split_point], indices[split_point:]
 
-        train_losses.append(epoch_train_loss)
-        val_losses.append(epoch_val_loss)
+    batch_size = 256 if torch.cuda.is_available() else 128
 
-        print(f"Epoch {epoch+1}/{num_epochs}: Train Loss: {epoch_train_loss:.4f}, Val Loss: {epoch_val_loss:.4f}")
+    image_indices = [idx for idx in range(dataset_size) if not dataset.file_paths[idx].endswith('.xml')]
+    xml_indices = [idx for idx in range(dataset_size) if dataset.file_paths[idx].endswith('.xml')]
 
-        scheduler.step(epoch_val_loss)
+    image_model = DocumentCNN(num_classes=dataset.num_classes)
+    tabular_head = TabularHead(TABULAR_FEATURES, dataset.num_classes) if xml_indices else None
+    model = FoldModel(image_model, tabular_head).to(device)
 
-        early_stopping(epoch_val_loss, model, model_path)
-        if early_stopping.early_stop:
-            print("Early stopping activado!")
-            break
+    # Cada ruta usa posiciones locales a su propio dataset
+    if embedding_cache_dir:
+        from embedding_cache import EmbeddingCache, EmbeddingDataset
 
-    return {"val_loss": val_losses, "train_loss": train_losses}
+        features = EmbeddingCache(embedding_cache_dir, image_model).embed(
+            dataset, device, indices=image_indices, batch_size=batch_size, collate_fn=custom_collate
+        )
+        image_dataset = EmbeddingDataset(features, [dataset.label] * len(image_indices))
+        image_modality = "embedding"
+        image_loader_options = {"drop_last": True}
+    else:
+        image_dataset = Subset(dataset, image_indices)
+        image_modality = "image"
+        image_loader_options = {
+            "num_workers": num_workers,
+            "pin_memory": device.type == "cuda",
+            "drop_last": True,
+            "collate_fn": custom_collate,
+        }
+        if num_workers > 0:
+            image_loader_options.update({"persistent_workers": True, "prefetch_factor": 2})
+
+    tabular_dataset = TabularDataset(
+        dataset.tabular.matrix([dataset.file_paths[idx] for idx in xml_indices]),
+        [dataset.label] * len(xml_indices)
+    )
 
-def train_single_fold(dataset, learning_dir, doc_type, current_fold, device):
-    dataset_size = len(dataset)
-    indices = list(range(dataset_size))
-    split = int(0.8 * dataset_size)
-    np.random.shuffle(indices)
-    train_indices, val_indices = indices[:split], indices[split:]
+    def make_loader(subset_dataset, subset_indices, split_indices, options):
+        position = {idx: pos for pos, idx in enumerate(subset_indices)}
+        positions = [position[idx] for idx in split_indices if idx in position]
+        if not positions:
+            return None
+        return DataLoader(subset_dataset, batch_size=batch_size, sampler=SubsetRandomSampler(positions), **options)
 
-    batch_size = 256 if torch.cuda.is_available() else 128
-    num_workers = 4
-
-    train_sampler = SubsetRandomSampler(train_indices)
-    val_sampler = SubsetRandomSampler(val_indices)
-
-    train_loader = DataLoader(
-        dataset,
-        batch_size=batch_size,
-        sampler=train_sampler,
-        num_workers=num_workers,
-        pin_memory=True,  
-        persistent_workers=True,
-        prefetch_factor=2,
-        drop_last=True,
-        collate_fn=custom_collate
+    train_loader = AlternatingLoader(
+        (image_modality, make_loader(image_dataset, image_indices, train_indices, image_loader_options)),
+        ("tabular", make_loader(tabular_dataset, xml_indices, train_indices, {})),
     )
-
-    val_loader = DataLoader(
-        dataset,
-        batch_size=batch_size,
-        sampler=val_sampler,
-        num_workers=num_workers,
-        pin_memory=True,
-        persistent_workers=True,
-        prefetch_factor=2,
-        drop_last=True,
-        collate_fn=custom_collate
+    val_loader = AlternatingLoader(
+        (image_modality, make_loader(image_dataset, image_indices, val_indices, image_loader_options)),
+        ("tabular", make_loader(tabular_dataset, xml_indices, val_indices, {})),
     )
 
-    model = DocumentCNN(num_classes=dataset.num_classes).to(device)
     criterion = nn.CrossEntropyLoss()
     optimizer = torch.optim.AdamW(model.parameters(), lr=0.001, weight_decay=0.01)
     scheduler = ReduceLROnPlateau(optimizer, mode='min', factor=0.1, patience=15, verbose=True)
@@ -256,26 +505,46 @@ def train_single_fold(dataset, learning_dir, doc_type, current_fold, device):
         device=device,
         num_epochs=20,
         model_path=model_path,
-        patience=15
+        patience=15,
+        state_path=state_path,
+        resume_state=resume_state,
+        extra_state={"split": (list(train_indices), list(val_indices)), "file_paths": list(dataset.file_paths)},
+        profile_path=os.path.join(learning_dir, f'profile_{doc_type.lower()}{current_fold}.json'),
     )
 
+    results["val_files"] = [dataset.file_paths[idx] for idx in val_indices]
     results_path = os.path.join(learning_dir, f'training_results_{doc_type.lower()}{current_fold}.json')
-    with open(results_path, 'w') as f:
+    with open(results_path + '.tmp', 'w') as f:
         json.dump(results, f)
+    os.replace(results_path + '.tmp', results_path)
+    if os.path.exists(state_path):
+        os.remove(state_path)  # Fold terminado: ya no hay nada que reanudar
 
     return model
 
-def get_best_model_path(document_type):
+LEARNING_DIR = os.path.join(os.path.dirname(__file__), 'learning')
+
+def get_best_model_path(document_type, learning_dir=LEARNING_DIR):
+    """
+    Checkpoint del fold con menor pérdida de validación según los
+    training_results_<tipo><fold>.json que escribe train_single_fold.
+    """
     best_val_loss = float('inf')
     best_model_path = None
+    prefix = f'training_results_{document_type.lower()}'
 
-    for fold in range(1, 6):
-        result_path = f'results_{document_type.lower()}_fold_{fold}.json'
-        model_path = f'model_{document_type.lower()}_fold_{fold}.pth'
+    for file_name in sorted(os.listdir(learning_dir)) if os.path.isdir(learning_dir) else []:
+        fold = file_name[len(prefix):-len('.json')]
+        if not (file_name.startswith(prefix) and file_name.endswith('.json') and fold.isdigit()):
+            continue
+        result_path = os.path.join(learning_dir, file_name)
+        model_path = os.path.join(learning_dir, f'model_fold_{document_type.lower()}{fold}.pth')
 
-        if os.path.exists(result_path) and os.path.exists(model_path):
+        if os.path.exists(model_path):
             with open(result_path, 'r') as f:
                 results = json.load(f)
+                if not results.get('val_loss'):
+                    continue
                 min_val_loss = min(results['val_loss'])
 
                 if min_val_loss < best_val_loss:
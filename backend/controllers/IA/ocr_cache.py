@@ -0,0 +1,165 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+from ocr_engine import get_engine
+
+# Caché de resultados de OCR direccionada por contenido. La clave es el hash de los píxeles
+# del recorte más el idioma, la configuración de Tesseract y su versión, de modo que un
+# documento re-enviado o re-validado no vuelve a pasar por Tesseract. Tiene dos niveles:
+# un LRU en memoria y una base SQLite en disco con desalojo por tamaño.
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'ocr_cache.sqlite')
+
+class OCRCache:
+    def __init__(self, path=None, max_bytes=None, memory_items=None):
+        self.path = path if path is not None else os.getenv('OCR_CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.max_bytes = max_bytes or int(os.getenv('OCR_CACHE_MAX_MB', '256')) * 1024 * 1024
+        self.memory_items = memory_items or int(os.getenv('OCR_CACHE_MEMORY_ITEMS', '512'))
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+        self._disk_size = 0
+        self._tesseract_version = None
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _connect(self):
+        # Una conexión por proceso (el pool de batch hace fork)
+        if not self.path:
+            return None
+        if self._connection is None or self._connection_pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_results ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS ocr_results_last_access ON ocr_results(last_access)")
+            self._connection = connection
+            self._connection_pid = os.getpid()
+            self._disk_size = self._stored_size(connection)
+        return self._connection
+
+    @property
+    def tesseract_version(self):
+        if self._tesseract_version is None:
+            try:
+                engine = get_engine()
+                self._tesseract_version = f"{engine.name} {engine.version}"
+            except Exception:
+                self._tesseract_version = "desconocida"
+        return self._tesseract_version
+
+    def key(self, image, lang, config, kind="text"):
+        digest = hashlib.sha256()
+        digest.update(f"{kind}|{image.mode}|{image.size}|{lang}|{config}|{self.tesseract_version}|".encode('utf-8'))
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return self._memory[key]
+
+            connection = self._connect()
+            row = None
+            if connection is not None:
+                row = connection.execute("SELECT text FROM ocr_results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+
+            connection.execute("UPDATE ocr_results SET last_access = ? WHERE key = ?", (time.time(), key))
+            connection.commit()
+            self.counters["disk_hits"] += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, key, text):
+        with self._lock:
+            self._remember(key, text)
+            connection = self._connect()
+            if connection is None:
+                return
+            size = len(key) + len(text.encode('utf-8'))
+            connection.execute(
+                "INSERT OR REPLACE INTO ocr_results (key, text, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, text, size, time.time())
+            )
+            connection.commit()
+            # Tamaño aproximado: otros procesos también escriben, se recalcula antes de desalojar
+            self._disk_size += size
+            if self._disk_size > self.max_bytes:
+                self._evict(connection)
+
+    def _remember(self, key, text):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def _stored_size(connection):
+        return connection.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0]
+
+    def _evict(self, connection):
+        total_size = self._stored_size(connection)
+        if total_size <= self.max_bytes:
+            self._disk_size = total_size
+            return
+        # Se libera hasta el 90% del máximo empezando por los menos usados
+        target = int(self.max_bytes * 0.9)
+        rows = connection.execute("SELECT key, size FROM ocr_results ORDER BY last_access").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total_size <= target:
+                break
+            evicted.append((key,))
+            total_size -= size
+        connection.executemany("DELETE FROM ocr_results WHERE key = ?", evicted)
+        connection.commit()
+        self._disk_size = total_size
+        self.counters["evictions"] += len(evicted)
+
+    def stats(self):
+        lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hits = lookups - self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_items": len(self._memory),
+        }
+
+default_cache = OCRCache()
+
+def image_to_string(image, lang="eng", config=""):
+    """
+    Igual que pytesseract.image_to_string, pero con el motor de ocr_engine y la caché de OCR.
+    """
+    key = default_cache.key(image, lang, config)
+    text = default_cache.get(key)
+    if text is None:
+        text = get_engine().image_to_string(image, lang=lang, config=config)
+        default_cache.put(key, text)
+    return text
+
+def image_to_data(image, lang="eng", config=""):
+    """
+    Igual que pytesseract.image_to_data (TSV con cajas por palabra), pasando por la caché de OCR.
+    """
+    key = default_cache.key(image, lang, config, kind="data")
+    data = default_cache.get(key)
+    if data is None:
+        data = get_engine().image_to_data(image, lang=lang, config=config)
+        default_cache.put(key, data)
+    return data
+
+def get_ocr_cache_stats():
+    return default_cache.stats()
@@ -0,0 +1,193 @@
+import os
+import shlex
+import time
+import threading
+import statistics
+
+import pytesseract
+
+# Capa de motores de OCR con la misma interfaz que usan las extracciones:
+# image_to_string(image, lang, config). El motor por defecto mantiene, por cada hilo,
+# instancias de la API de Tesseract (tesserocr) ya inicializadas con "eng" y "eng+spa",
+# y les pasa la imagen en memoria: sin procesos nuevos, sin archivos temporales y sin
+# recargar los traineddata en cada recorte. tesserocr es una dependencia opcional (no
+# está en requirements.txt): si no está instalado, o no encuentra los traineddata, se usa
+# pytesseract, que lanza un proceso de tesseract por llamada.
+#
+# OCR_ENGINE=auto|tesserocr|pytesseract elige el motor (auto por defecto).
+
+PRELOADED_LANGUAGES = ["eng", "eng+spa"]
+TSV_HEADER = "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext"
+
+def parse_config(config):
+    """
+    Obtiene el --psm de una configuración estilo línea de comandos ("--psm 6").
+    Devuelve (True, psm) o (False, None) si hay opciones que la API no admite por llamada.
+    """
+    tokens = shlex.split(config or "")
+    if not tokens:
+        return True, None
+    if len(tokens) == 2 and tokens[0] == "--psm" and tokens[1].isdigit():
+        return True, int(tokens[1])
+    return False, None
+
+class PytesseractEngine:
+    name = "pytesseract"
+
+    def image_to_string(self, image, lang="eng", config=""):
+        return pytesseract.image_to_string(image, lang=lang, config=config)
+
+    def image_to_data(self, image, lang="eng", config=""):
+        """Palabras reconocidas con sus cajas, en formato TSV de Tesseract (con encabezado)."""
+        return pytesseract.image_to_data(image, lang=lang, config=config)
+
+    @property
+    def version(self):
+        return str(pytesseract.get_tesseract_version())
+
+class TesserocrEngine:
+    name = "tesserocr"
+
+    def __init__(self, languages=None):
+        import tesserocr
+
+        self._tesserocr = tesserocr
+        self.languages = languages or PRELOADED_LANGUAGES
+        self._local = threading.local()
+        self._handles = []
+        self._handles_lock = threading.Lock()
+        self._fallback = PytesseractEngine()
+        self._apis()  # Falla aquí (RuntimeError) si faltan los traineddata, no en el primer OCR
+
+    def _apis(self):
+        apis = getattr(self._local, "apis", None)
+        if apis is None:
+            apis = {}
+            for lang in self.languages:
+                apis[lang] = self._create_api(lang)
+            self._local.apis = apis
+        return apis
+
+    def _create_api(self, lang):
+        kwargs = {"lang": lang}
+        if os.environ.get("TESSDATA_PREFIX"):
+            kwargs["path"] = os.environ["TESSDATA_PREFIX"]
+        api = self._tesserocr.PyTessBaseAPI(**kwargs)
+        with self._handles_lock:
+            self._handles.append(api)
+        return api
+
+    def image_to_string(self, image, lang="eng", config=""):
+        supported, psm = parse_config(config)
+        if not supported:
+            return self._fallback.image_to_string(image, lang=lang, config=config)
+
+        apis = self._apis()
+        if lang not in apis:
+            apis[lang] = self._create_api(lang)
+        api = apis[lang]
+
+        api.SetPageSegMode(psm if psm is not None else self._tesserocr.PSM.AUTO)
+        try:
+            api.SetImage(image)
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+    def image_to_data(self, image, lang="eng", config=""):
+        supported, psm = parse_config(config)
+        if not supported:
+            return self._fallback.image_to_data(image, lang=lang, config=config)
+
+        apis = self._apis()
+        if lang not in apis:
+            apis[lang] = self._create_api(lang)
+        api = apis[lang]
+
+        api.SetPageSegMode(psm if psm is not None else self._tesserocr.PSM.AUTO)
+        try:
+            api.SetImage(image)
+            api.Recognize()
+            return TSV_HEADER + "\n" + api.GetTSVText(0)
+        finally:
+            api.Clear()
+
+    @property
+    def version(self):
+        return self._tesserocr.tesseract_version().splitlines()[0]
+
+    def close(self):
+        with self._handles_lock:
+            for api in self._handles:
+                api.End()
+            self._handles.clear()
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def create_engine(name=None):
+    name = name or os.getenv("OCR_ENGINE", "auto")
+    if name == "pytesseract":
+        return PytesseractEngine()
+    try:
+        return TesserocrEngine()
+    except (ImportError, RuntimeError) as e:
+        if name == "tesserocr":
+            raise
+        print(f"tesserocr no disponible, se usa pytesseract: {str(e)}")
+        return PytesseractEngine()
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine()
+    return _engine
+
+def image_to_string(image, lang="eng", config=""):
+    return get_engine().image_to_string(image, lang=lang, config=config)
+
+def image_to_data(image, lang="eng", config=""):
+    return get_engine().image_to_data(image, lang=lang, config=config)
+
+def benchmark(image_path, repeat=10, regions=None):
+    """
+    Latencia por recorte de cada motor disponible (sin caché de OCR).
+    """
+    from PIL import Image
+
+    image = Image.open(image_path)
+    image.load()
+    regions = regions or [
+        (0, 0, image.width, image.height),
+        (50, 600, 450, 900),
+        (500, 600, 850, 900),
+    ]
+    crops = [image.crop(region) for region in regions]
+
+    engines = [PytesseractEngine()]
+    try:
+        engines.append(TesserocrEngine())
+    except (ImportError, RuntimeError) as e:
+        print(f"tesserocr no disponible ({str(e)}); solo se mide pytesseract")
+
+    report = {}
+    for engine in engines:
+        # Primera llamada fuera de la medición (carga de la API en el hilo)
+        engine.image_to_string(crops[0], lang="eng")
+        latencies = []
+        for _ in range(repeat):
+            for crop in crops:
+                start_time = time.perf_counter()
+                engine.image_to_string(crop, lang="eng+spa", config="--psm 6")
+                latencies.append((time.perf_counter() - start_time) * 1000)
+        report[engine.name] = {
+            "crops": len(latencies),
+            "mean_ms": statistics.mean(latencies),
+            "median_ms": statistics.median(latencies),
+            "max_ms": max(latencies),
+        }
+        if hasattr(engine, "close"):
+            engine.close()
+    return report
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Orquestador de entrenamiento k-fold sin interacción: reparte los trabajos (tipo, fold)
+# entre procesos, divide los núcleos entre ellos para que los hilos de PyTorch no se
+# pisen, salta los folds que ya tienen modelo y resultados, y escribe un resumen con las
+# métricas y el tiempo de cada fold.
+
+DOCUMENT_TYPES = ["Invoice", "ServiceDeliveryRecord", "Contract"]
+FILE_PREFIXES = {"Invoice": "invoice_", "ServiceDeliveryRecord": "delivery_", "Contract": "contract_"}
+FILE_EXTENSIONS = {
+    "Invoice": (".pdf", ".png", ".xml"),
+    "ServiceDeliveryRecord": (".pdf", ".png", ".xml"),
+    "Contract": (".pdf", ".xml"),
+}
+
+LEARNING_DIR = os.path.join(os.path.dirname(__file__), 'learning')
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data', 'train')
+
+def discover_files(data_dir, doc_type):
+    """
+    Archivos de entrenamiento de un tipo, ordenados para que las particiones sean estables.
+    """
+    dataset_path = os.path.join(data_dir, doc_type.lower())
+    valid_files = []
+    for root, dirs, files in os.walk(dataset_path):
+        for file in files:
+            if file.startswith(FILE_PREFIXES[doc_type]) and file.endswith(FILE_EXTENSIONS[doc_type]):
+                valid_files.append(os.path.join(root, file))
+    return sorted(valid_files)
+
+def fold_artifacts(learning_dir, doc_type, fold):
+    return (
+        os.path.join(learning_dir, f'model_fold_{doc_type.lower()}{fold}.pth'),
+        os.path.join(learning_dir, f'training_results_{doc_type.lower()}{fold}.json'),
+    )
+
+def fold_metrics(results_path):
+    with open(results_path, 'r') as f:
+        results = json.load(f)
+    val_losses = results.get("val_loss", [])
+    train_losses = results.get("train_loss", [])
+    return {
+        "epochs": len(val_losses),
+        "best_val_loss": min(val_losses) if val_losses else None,
+        "final_train_loss": train_losses[-1] if train_losses else None,
+    }
+
+def init_worker(threads):
+    # Antes de importar torch: las librerías OpenMP/MKL leen estas variables al cargar
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    os.environ["TRAIN_THREADS"] = str(threads)
+
+    # Una sola vez por proceso: el pool reutiliza los procesos entre trabajos y los hilos
+    # inter-op no se pueden cambiar después del primer trabajo paralelo
+    from training_engine import configure_threads
+    configure_threads(threads, 1)
+
+def run_fold_job(job):
+    """
+    Entrena un (tipo, fold) en el proceso actual y devuelve su registro para el resumen.
+    """
+    import torch
+    from model import DocumentDataset, train_single_fold, kfold_splits
+
+    start_time = time.time()
+    doc_type, fold = job["doc_type"], job["fold"]
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    valid_files = discover_files(job["data_dir"], doc_type)
+    if not valid_files:
+        raise ValueError(f"No se encontraron archivos válidos para {doc_type} en {job['data_dir']}")
+
+    print(f"\nIniciando entrenamiento para {doc_type} - Fold {fold}/{job['num_folds']} ({len(valid_files)} documentos)")
+    dataset = DocumentDataset(
+        file_paths=valid_files,
+        document_type=doc_type,
+        cache_dir=os.path.join(job["learning_dir"], 'cache'),
+        update_cache=False,
+    )
+    split = kfold_splits(len(dataset), job["num_folds"], seed=job["seed"])[fold - 1]
+    train_single_fold(
+        dataset, job["learning_dir"], doc_type, fold, device,
+        embedding_cache_dir=job["embedding_cache_dir"],
+        split=split,
+        num_workers=job["loader_workers"],
+        resume=job["resume"],
+    )
+
+    _, results_path = fold_artifacts(job["learning_dir"], doc_type, fold)
+    return {"status": "trained", "wall_time": time.time() - start_time, **fold_metrics(results_path)}
+
+def prepare_caches(doc_types, data_dir, learning_dir):
+    """
+    Construye (o actualiza) el caché de imágenes de cada tipo una vez, antes de repartir
+    los folds, para que los procesos no lo escriban a la vez.
+    """
+    from tensor_cache import TensorCache
+
+    for label, doc_type in enumerate(DOCUMENT_TYPES):
+        if doc_type in doc_types:
+            TensorCache(os.path.join(learning_dir, 'cache'), doc_type).update(discover_files(data_dir, doc_type), label)
+
+def run_kfold(num_folds=5, doc_types=None, workers=1, seed=0, use_embeddings=False, resume=False,
+              data_dir=DATA_DIR, learning_dir=LEARNING_DIR, summary_path=None):
+    """
+    Entrena num_folds folds por tipo de documento con workers procesos y devuelve el resumen.
+    Con resume los folds interrumpidos continúan desde su último estado guardado.
+    """
+    if num_folds < 2:
+        raise ValueError("Se necesitan al menos 2 folds")
+    start_time = time.time()
+    doc_types = doc_types or DOCUMENT_TYPES
+    os.makedirs(learning_dir, exist_ok=True)
+    summary_path = summary_path or os.path.join(learning_dir, 'kfold_summary.json')
+
+    total_cores = os.cpu_count() or 1
+    workers = max(1, min(workers, total_cores))
+    threads = max(1, total_cores // workers)
+    loader_workers = min(4, threads - 1)
+
+    summary = {"num_folds": num_folds, "seed": seed, "workers": workers, "threads_per_worker": threads, "folds": {}}
+    jobs = []
+    for doc_type in doc_types:
+        for fold in range(1, num_folds + 1):
+            key = f"{doc_type}:{fold}"
+            model_path, results_path = fold_artifacts(learning_dir, doc_type, fold)
+            if os.path.exists(model_path) and os.path.exists(results_path):
+                print(f"Modelo {doc_type} para fold {fold} ya existe, saltando...")
+                summary["folds"][key] = {"status": "skipped", "wall_time": 0.0, **fold_metrics(results_path)}
+                continue
+            jobs.append({
+                "doc_type": doc_type,
+                "fold": fold,
+                "num_folds": num_folds,
+                "seed": seed,
+                "loader_workers": loader_workers,
+                "data_dir": data_dir,
+                "learning_dir": learning_dir,
+                "embedding_cache_dir": os.path.join(learning_dir, 'embeddings') if use_embeddings else None,
+                "resume": resume,
+            })
+
+    if jobs:
+        prepare_caches({job["doc_type"] for job in jobs}, data_dir, learning_dir)
+        # spawn: cada proceso inicia torch con sus propios hilos
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=init_worker, initargs=(threads,)) as executor:
+            futures = {executor.submit(run_fold_job, job): f"{job['doc_type']}:{job['fold']}" for job in jobs}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    summary["folds"][key] = future.result()
+                except Exception as e:
+                    print(f"Error durante el entrenamiento de {key}: {str(e)}")
+                    summary["folds"][key] = {"status": "error", "error": str(e)}
+                print(f"Fold {key}: {summary['folds'][key]}")
+
+    summary["wall_time"] = time.time() - start_time
+    temp_path = summary_path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    os.replace(temp_path, summary_path)
+    return summary
@@ -0,0 +1,111 @@
+import os
+import weakref
+from bisect import bisect_left, bisect_right
+
+import ocr_cache
+
+# OCR de página completa: Tesseract se ejecuta una sola vez por imagen (image_to_data) y
+# los campos por región o por desplazamiento se resuelven consultando las cajas de las
+# palabras reconocidas, sin volver a llamar a Tesseract por cada recorte.
+#
+# OCR_MODE=page activa este modo; OCR_MODE=region (por defecto) conserva el OCR por
+# recorte hasta validar que el modo página da los mismos resultados. En modo página las
+# páginas escaneadas de un PDF se reconocen una sola vez con PAGE_OCR_LANG y de ese OCR
+# salen tanto su texto como el de los recuadros de firma.
+
+PAGE_OCR_LANG = "eng+spa"
+
+class PageOCR:
+    """
+    Palabras reconocidas en una imagen, indexadas por el centro vertical de su caja.
+    """
+    def __init__(self, image, lang="eng"):
+        self.lang = lang
+        self.words = self._parse(ocr_cache.image_to_data(image, lang=lang))
+        self.words.sort(key=lambda word: word["center_y"])
+        self._centers_y = [word["center_y"] for word in self.words]
+
+    @staticmethod
+    def _parse(tsv):
+        lines = tsv.splitlines()
+        if not lines:
+            return []
+        header = lines[0].split("\t")
+        words = []
+        for line in lines[1:]:
+            values = line.split("\t")
+            if len(values) != len(header):
+                continue
+            row = dict(zip(header, values))
+            text = row["text"].strip()
+            if row["level"] != "5" or not text:
+                continue
+            left, top = int(row["left"]), int(row["top"])
+            width, height = int(row["width"]), int(row["height"])
+            words.append({
+                "text": text,
+                "left": left,
+                "top": top,
+                "width": width,
+                "height": height,
+                "center_x": left + width / 2,
+                "center_y": top + height / 2,
+                "line": (int(row["block_num"]), int(row["par_num"]), int(row["line_num"])),
+                "word_num": int(row["word_num"]),
+            })
+        return words
+
+    def words_in(self, left, top, right, bottom):
+        """Palabras cuyo centro cae dentro del rectángulo (left, top, right, bottom)."""
+        start = bisect_left(self._centers_y, top)
+        end = bisect_right(self._centers_y, bottom)
+        return [word for word in self.words[start:end] if left <= word["center_x"] <= right]
+
+    def text_in(self, left, top, right, bottom):
+        """
+        Texto del rectángulo en orden de lectura: una línea por línea de Tesseract.
+        """
+        return self._join(self.words_in(left, top, right, bottom))
+
+    def text(self):
+        """Texto de toda la imagen en orden de lectura."""
+        return self._join(self.words)
+
+    @staticmethod
+    def _join(words):
+        lines = {}
+        for word in words:
+            lines.setdefault(word["line"], []).append(word)
+        return "\n".join(
+            " ".join(word["text"] for word in sorted(lines[line], key=lambda word: word["left"]))
+            for line in sorted(lines)
+        )
+
+_page_ocr = {}
+
+def get_page_ocr(image, lang="eng"):
+    """
+    OCR de página memorizado por imagen (mientras la imagen exista) e idioma.
+    """
+    image_id = id(image)
+    if image_id not in _page_ocr:
+        _page_ocr[image_id] = {}
+        weakref.finalize(image, _page_ocr.pop, image_id, None)
+    per_image = _page_ocr[image_id]
+    if lang not in per_image:
+        per_image[lang] = PageOCR(image, lang)
+    return per_image[lang]
+
+def page_mode_enabled():
+    return os.getenv("OCR_MODE", "region") == "page"
+
+def ocr_region(image, box, lang="eng", config=""):
+    """
+    Texto de la región box = (left, top, right, bottom) de la imagen.
+    En modo página se responde desde el OCR completo de la imagen; en modo región, o si
+    se pasa una configuración propia de Tesseract (p. ej. --psm 6), que el OCR de página
+    no respetaría, se recorta y se reconoce solo el recorte.
+    """
+    if page_mode_enabled() and not config:
+        return get_page_ocr(image, lang).text_in(*box)
+    return ocr_cache.image_to_string(image.crop(box), lang=lang, config=config)
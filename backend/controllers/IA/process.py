@@ -17,6 +17,7 @@ from extractions import (
     extract_relative_field, 
     extract_field_from_xml, 
     extract_sequential_fields, 
+    extract_field_chains,
     extract_table_data, 
     extract_signatures_from_image,
     extract_provider_fields,
@@ -27,6 +28,9 @@ from extractions import (
 
 )
 
+from document import ParsedDocument
+from scanner import get_field_scanner
+
 from utils import (
     #imports use in contract
     convert_pdf_to_images, 
@@ -68,7 +72,7 @@ from validations import (
 )
 
 # Funciones de procesamiento de documentos específicos
-def process_service_delivery_record_document(file_path, schema,  ruc_input, auxiliar_input,auxiliar_hes_input, text=None, xml_tree=None):
+def process_service_delivery_record_document(document, schema,  ruc_input, auxiliar_input,auxiliar_hes_input, text=None, xml_tree=None):
     print("process_service_delivery_record_document")
     start_time = time.time() 
     extracted_data = {}
@@ -94,10 +98,14 @@ def process_service_delivery_record_document(file_path, schema,  ruc_input, auxi
             # Unir texto en una línea continua
             continuous_text = text.replace("\n", " ").strip()
 
+            # Todos los campos con regex se buscan en una sola pasada sobre el texto
+            regex_fields = [field_name for field_name, field_info in record_fields.items() if "regex" in field_info]
+            matches = get_field_scanner(schema, "ServiceDeliveryRecord", regex_fields).scan(continuous_text)
+
             for field_name, field_info in record_fields.items():
                 if "regex" in field_info:
                     try:
-                        match = re.search(field_info["regex"], continuous_text)
+                        match = matches[field_name]
                         if match and match.group(1):  
                             value = match.group(1).strip()
 
@@ -136,7 +144,7 @@ def process_service_delivery_record_document(file_path, schema,  ruc_input, auxi
                 )
 
         if "signatures" in record_fields:
-            extracted_signatures, missing_signatures = validate_signatures_and_positions_record(file_path, schema, "signatures")
+            extracted_signatures, missing_signatures = validate_signatures_and_positions_record(document, schema, "signatures")
             extracted_data.update(extracted_signatures)
             missing_fields.extend(missing_signatures)
 
@@ -168,7 +176,7 @@ def process_service_delivery_record_document(file_path, schema,  ruc_input, auxi
         "execution_time": execution_time,
     }
 
-def process_invoice_document(file_path, schema, ruc_input, auxiliar_input, text=None, xml_tree=None):
+def process_invoice_document(document, schema, ruc_input, auxiliar_input, text=None, xml_tree=None):
     start_time = time.time() 
     extracted_data = {}
     confidence_scores = {}    
@@ -186,7 +194,7 @@ def process_invoice_document(file_path, schema, ruc_input, auxiliar_input, text=
 
     try:
         # Llama a la función principal para extraer los datos
-        extracted_data = extract_invoice_data(file_path)
+        extracted_data = extract_invoice_data(document)
 
         # Validar campos requeridos
         for field in required_fields:
@@ -230,7 +238,7 @@ def process_invoice_document(file_path, schema, ruc_input, auxiliar_input, text=
         "execution_time": execution_time,
     }
 
-def process_contract_document(file_path, schema, ruc_input, auxiliar_input, text=None, xml_tree=None):
+def process_contract_document(document, schema, ruc_input, auxiliar_input, text=None, xml_tree=None):
     print("process_contract_document")
     start_time = time.time() 
     extracted_data = {}
@@ -251,28 +259,26 @@ def process_contract_document(file_path, schema, ruc_input, auxiliar_input, text
     contract_fields = schema["Contract"]["fields"]
 
     if text:
-        for field_name, field_info in contract_fields.items():
-            if "regex" in field_info and "relative_to" not in field_info:
-                match = re.search(field_info["regex"], text)
-                if match:
-                    try:
-                        extracted_data[field_name] = match.group(1).strip()
-                    except IndexError:
-                        validation_errors.append(f"El grupo 1 no existe en el patrón de {field_name}")
-                elif field_name in required_fields:
-                    missing_fields.append(field_name)
-
-        client_fields = {
-            key: value for key, value in contract_fields.items() if key.startswith("client_")
-        }
-        client_data = extract_sequential_fields(text, schema, "client_info_intro", client_fields)
-        extracted_data.update(client_data)
+        # Todos los campos independientes se buscan en una sola pasada sobre el texto
+        regex_fields = [
+            field_name for field_name, field_info in contract_fields.items()
+            if "regex" in field_info and "relative_to" not in field_info
+        ]
+        matches = get_field_scanner(schema, "Contract", regex_fields).scan(text)
+
+        for field_name in regex_fields:
+            match = matches[field_name]
+            if match:
+                try:
+                    extracted_data[field_name] = match.group(1).strip()
+                except IndexError:
+                    validation_errors.append(f"El grupo 1 no existe en el patrón de {field_name}")
+            elif field_name in required_fields:
+                missing_fields.append(field_name)
 
-        provider_fields = {
-            key: value for key, value in contract_fields.items() if key.startswith("provider_")
-        }
-        provider_data = extract_sequential_fields(text, schema, "provider_info_intro", provider_fields)
-        extracted_data.update(provider_data)
+        # Cadenas de campos del cliente y del proveedor (relative_to)
+        chain_data = extract_field_chains(text, schema, "Contract", ["client_info_intro", "provider_info_intro"])
+        extracted_data.update(chain_data)
 
         if "service_table" in contract_fields:
             table_schema = contract_fields["service_table"]
@@ -283,7 +289,7 @@ def process_contract_document(file_path, schema, ruc_input, auxiliar_input, text
                 extracted_data["service_table"] = table_data
 
         if "contract_start_date" in contract_fields:
-            match = re.search(contract_fields["contract_start_date"]["regex"], text)
+            match = matches["contract_start_date"]
             if match:
                 extracted_data["contract_start_date"] = match.group(1).strip()
             else:
@@ -291,7 +297,7 @@ def process_contract_document(file_path, schema, ruc_input, auxiliar_input, text
         
 
         if "signatures" in contract_fields:
-            extracted_signatures, missing_signatures = validate_signatures_and_positions(file_path, schema, "signatures")
+            extracted_signatures, missing_signatures = validate_signatures_and_positions(document, schema, "signatures")
             extracted_data.update(extracted_signatures)
             missing_fields.extend(missing_signatures)
 
@@ -371,23 +377,24 @@ def process_single_document(file_path, document_type, ruc_input, auxiliar_input,
         text = None
         xml_tree = None
 
-        if file_path.endswith('.pdf'):
-            text = extract_text_from_pdf(file_path)  
-        elif file_path.endswith('.xml'):
-            xml_tree = ET.parse(file_path)
-        elif file_path.endswith('.png'):
-            text = extract_text_from_document(file_path)
-        else:
-            raise ValueError(f"Tipo de archivo no soportado: {file_path}")
-
-        if document_type == "Invoice":
-            result = process_invoice_document(file_path, schema, ruc_input, auxiliar_input, text, xml_tree)
-        elif document_type == "ServiceDeliveryRecord":
-            result = process_service_delivery_record_document(file_path, schema, ruc_input, auxiliar_input, auxiliar_hes_input, text, xml_tree)
-        elif document_type == "Contract":
-            result = process_contract_document(file_path, schema, ruc_input, auxiliar_input, text, xml_tree)
-        else:
-            raise ValueError(f"Tipo de documento no soportado: {document_type}")
+        with ParsedDocument(file_path) as document:
+            if document.is_pdf:
+                text = extract_text_from_pdf(document)
+            elif document.is_xml:
+                xml_tree = document.xml_tree
+            elif document.is_image:
+                text = extract_text_from_document(document)
+            else:
+                raise ValueError(f"Tipo de archivo no soportado: {file_path}")
+
+            if document_type == "Invoice":
+                result = process_invoice_document(document, schema, ruc_input, auxiliar_input, text, xml_tree)
+            elif document_type == "ServiceDeliveryRecord":
+                result = process_service_delivery_record_document(document, schema, ruc_input, auxiliar_input, auxiliar_hes_input, text, xml_tree)
+            elif document_type == "Contract":
+                result = process_contract_document(document, schema, ruc_input, auxiliar_input, text, xml_tree)
+            else:
+                raise ValueError(f"Tipo de documento no soportado: {document_type}")
 
         result.update({
             "document_type": document_type,
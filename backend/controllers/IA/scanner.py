@@ -0,0 +1,132 @@
+import re
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+# Escáner de varios campos en una sola pasada. De cada regex del esquema se obtiene el
+# conjunto de prefijos literales con los que tiene que empezar cualquier coincidencia
+# (por ejemplo "nombre"/"name" en "\b(?:nombre|name)\s*..."). Una sola búsqueda de todos
+# los prefijos sobre el texto en minúsculas da las posiciones candidatas y cada regex
+# completo solo se prueba en las posiciones de sus propios prefijos. El resultado es el
+# mismo que pattern.search(text): la primera posición donde el regex coincide.
+
+MIN_ANCHOR_LENGTH = 2
+MAX_ANCHORS_PER_FIELD = 64
+
+def _literal_prefixes(items):
+    """
+    Devuelve (prefijos, completo): los prefijos literales obligatorios de la secuencia y si
+    la secuencia entera es literal (para poder seguir concatenando lo que viene después).
+    """
+    prefixes = [""]
+    for op, av in items:
+        if op is sre_constants.AT:
+            continue  # \b, ^, $: no consumen caracteres
+        if op is sre_constants.LITERAL:
+            prefixes = [prefix + chr(av) for prefix in prefixes]
+            continue
+        if op is sre_constants.SUBPATTERN:
+            sub_prefixes, complete = _literal_prefixes(av[-1])
+        elif op is sre_constants.IN and all(item_op is sre_constants.LITERAL for item_op, _ in av):
+            sub_prefixes, complete = [chr(code) for _, code in av], True  # Clases como [aá]
+        elif op is sre_constants.BRANCH:
+            branches = [_literal_prefixes(branch) for branch in av[1]]
+            sub_prefixes = [prefix for branch_prefixes, _ in branches for prefix in branch_prefixes]
+            complete = all(branch_complete for _, branch_complete in branches)
+        else:
+            return prefixes, False
+
+        prefixes = [prefix + sub_prefix for prefix in prefixes for sub_prefix in sub_prefixes]
+        if len(prefixes) > MAX_ANCHORS_PER_FIELD or not complete:
+            return prefixes, False
+    return prefixes, True
+
+def literal_anchors(pattern):
+    """
+    Prefijos literales (en minúsculas) de un regex compilado, o None si no se pueden usar.
+    """
+    try:
+        anchors, _ = _literal_prefixes(sre_parse.parse(pattern.pattern, pattern.flags))
+    except Exception:
+        return None
+    anchors = {anchor.lower() for anchor in anchors}
+    if len(anchors) > MAX_ANCHORS_PER_FIELD or any(len(anchor) < MIN_ANCHOR_LENGTH for anchor in anchors):
+        return None
+    return anchors
+
+class FieldScanner:
+    """
+    Plan de búsqueda para un conjunto de campos {nombre: regex compilado}.
+    """
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self.anchored = {}
+        self.unanchored = []
+        fields_by_anchor = {}
+
+        for field_name, pattern in patterns.items():
+            anchors = literal_anchors(pattern)
+            if anchors:
+                self.anchored[field_name] = anchors
+                for anchor in anchors:
+                    fields_by_anchor.setdefault(anchor, []).append(field_name)
+            else:
+                self.unanchored.append(field_name)
+
+        self.fields_by_anchor = fields_by_anchor
+        # Anticipación de ancho cero para obtener todas las posiciones, aunque se solapen
+        anchors = sorted(fields_by_anchor, key=len, reverse=True)
+        self.prefilter = re.compile("(?=(" + "|".join(map(re.escape, anchors)) + "))") if anchors else None
+        self._anchors_by_first_char = {}
+        for anchor in anchors:
+            self._anchors_by_first_char.setdefault(anchor[0], []).append(anchor)
+
+    def scan(self, text):
+        """
+        Devuelve {campo: match o None} con el mismo resultado que pattern.search(text).
+        """
+        results = {field_name: None for field_name in self.patterns}
+        lowered = text.lower()
+
+        if self.prefilter is None or len(lowered) != len(text):
+            # Sin prefijos útiles (o minúsculas que cambian la longitud): búsqueda directa
+            for field_name, pattern in self.patterns.items():
+                results[field_name] = pattern.search(text)
+            return results
+
+        pending = set(self.anchored)
+        for hit in self.prefilter.finditer(lowered):
+            position = hit.start()
+            for anchor in self._anchors_by_first_char[lowered[position]]:
+                if not lowered.startswith(anchor, position):
+                    continue
+                for field_name in self.fields_by_anchor[anchor]:
+                    if field_name not in pending:
+                        continue
+                    match = self.patterns[field_name].match(text, position)
+                    if match:
+                        results[field_name] = match
+                        pending.discard(field_name)
+            if not pending:
+                break
+
+        for field_name in self.unanchored:
+            results[field_name] = self.patterns[field_name].search(text)
+        return results
+
+_scanners = {}
+
+def get_field_scanner(schema, document_type, field_names):
+    """
+    Escáner memorizado por versión del esquema, tipo de documento y campos.
+    """
+    key = (schema.version, document_type, tuple(field_names))
+    if key not in _scanners:
+        _scanners[key] = FieldScanner({
+            field_name: schema.pattern(document_type, field_name) for field_name in field_names
+        })
+    return _scanners[key]
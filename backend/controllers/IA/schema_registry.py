@@ -0,0 +1,103 @@
+import os
+import re
+import json
+import hashlib
+import threading
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', 'schemas.json')
+
+class CompiledSchema(dict):
+    """
+    Contenido de schemas.json (se usa como el dict de siempre) con los regex ya compilados.
+
+    - pattern(tipo, campo): regex del campo compilado. Los campos anidados se nombran con
+      su ruta, por ejemplo "signatures.first_person_name" o "service_table.service_code".
+    - values_pattern(tipo, campo): alternativa compilada de la lista "values" del campo.
+    - chain(tipo, campo_inicial): campos encadenados por "relative_to" a partir del inicial.
+    - version: hash del archivo, útil como parte de claves de caché.
+    """
+    def __init__(self, raw, version):
+        super().__init__(raw)
+        self.version = version
+        self._patterns = {}
+        self._values_patterns = {}
+        self._chains = {}
+
+        for document_type, document_schema in raw.items():
+            fields = document_schema.get("fields", {})
+            self._patterns[document_type] = {}
+            self._values_patterns[document_type] = {}
+            self._compile_fields(document_type, fields, prefix="")
+            self._chains[document_type] = self._resolve_chains(fields)
+
+    def _compile_fields(self, document_type, fields, prefix):
+        for field_name, field_info in fields.items():
+            path = f"{prefix}{field_name}"
+            if "regex" in field_info:
+                self._patterns[document_type][path] = re.compile(field_info["regex"])
+            if "values" in field_info:
+                self._values_patterns[document_type][path] = re.compile(
+                    r"\b(" + "|".join(map(re.escape, field_info["values"])) + r")\b", re.IGNORECASE
+                )
+            for nested_key in ("fields", "columns"):
+                if nested_key in field_info:
+                    self._compile_fields(document_type, field_info[nested_key], prefix=f"{path}.")
+
+    @staticmethod
+    def _resolve_chains(fields):
+        # El siguiente campo de la cadena es el primero (en orden del esquema) que apunta al actual
+        next_field = {}
+        for field_name, field_info in fields.items():
+            parent = field_info.get("relative_to")
+            if isinstance(parent, str) and parent not in next_field:
+                next_field[parent] = field_name
+
+        chains = {}
+        for start_field in fields:
+            chain = [start_field]
+            while chain[-1] in next_field and next_field[chain[-1]] not in chain:
+                chain.append(next_field[chain[-1]])
+            chains[start_field] = chain
+        return chains
+
+    def pattern(self, document_type, field_path):
+        return self._patterns[document_type].get(field_path)
+
+    def patterns(self, document_type):
+        return self._patterns[document_type]
+
+    def values_pattern(self, document_type, field_path):
+        return self._values_patterns[document_type].get(field_path)
+
+    def chain(self, document_type, start_field):
+        return self._chains[document_type].get(start_field, [])
+
+class SchemaRegistry:
+    """
+    Carga schemas.json una sola vez y lo vuelve a compilar solo si el archivo cambia.
+    """
+    def __init__(self, schema_path=SCHEMA_PATH):
+        self.schema_path = schema_path
+        self._schema = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        mtime = os.stat(self.schema_path).st_mtime_ns
+        if self._schema is not None and mtime == self._mtime:
+            return self._schema
+
+        with self._lock:
+            if self._schema is None or mtime != self._mtime:
+                with open(self.schema_path, 'rb') as f:
+                    content = f.read()
+                version = hashlib.sha256(content).hexdigest()[:16]
+                if self._schema is None or version != self._schema.version:
+                    self._schema = CompiledSchema(json.loads(content.decode('utf-8')), version)
+                self._mtime = mtime
+        return self._schema
+
+registry = SchemaRegistry()
+
+def get_document_schema():
+    return registry.get()
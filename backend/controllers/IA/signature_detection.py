@@ -0,0 +1,151 @@
+import time
+import statistics
+
+import cv2
+import numpy as np
+
+# Detección de regiones de firma con cv2.connectedComponentsWithStats: OpenCV devuelve en
+# un solo arreglo la caja y el área de cada componente, y el filtrado por tamaño y
+# proporción se hace con máscaras de NumPy, sin recorrer los contornos en Python.
+# Opcionalmente se detecta primero en un nivel reducido de la pirámide y solo los
+# candidatos se confirman a resolución completa.
+#
+# No está en la ruta de validación de documentos (validations.py usa ink_density): hoy
+# solo la usan extractions.detect_signature_regions y el comando bench-signatures.
+
+MIN_AREA = 5000
+MAX_AREA = 50000
+MIN_ASPECT_RATIO = 1.5
+MAX_ASPECT_RATIO = 4
+REGION_MARGIN = 20
+
+def binarize(gray):
+    """Umbral adaptativo (tinta en blanco sobre fondo negro), igual que la detección original."""
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2)
+
+def component_boxes(binary, min_area=MIN_AREA, max_area=MAX_AREA,
+                    min_aspect=MIN_ASPECT_RATIO, max_aspect=MAX_ASPECT_RATIO):
+    """
+    Cajas (x, y, w, h) de los componentes conexos cuya caja cumple los límites de área
+    (w * h) y de proporción (w / h), como arreglo N x 4.
+    """
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    boxes = stats[1:, :4].astype(np.int64)  # La etiqueta 0 es el fondo
+    widths, heights = boxes[:, 2], boxes[:, 3]
+    areas = widths * heights
+    aspect_ratios = widths / np.maximum(heights, 1)
+    mask = (
+        (areas > min_area) & (areas < max_area) &
+        (aspect_ratios > min_aspect) & (aspect_ratios < max_aspect)
+    )
+    return boxes[mask]
+
+def expand_boxes(boxes, image_width, image_height, margin=REGION_MARGIN):
+    """
+    Regiones {"left", "top", "width", "height"} ampliadas para incluir el texto cercano.
+    """
+    return [
+        {
+            "left": int(max(0, x - margin)),
+            "top": int(max(0, y - margin)),
+            "width": int(min(w + 2 * margin, image_width - x)),
+            "height": int(min(h + 2 * margin, image_height - y)),
+        }
+        for x, y, w, h in boxes
+    ]
+
+def find_signature_boxes(gray, pyramid_levels=0):
+    """
+    Cajas candidatas a firma en una imagen de grises 2D. Con pyramid_levels > 0 se buscan
+    candidatos en la imagen reducida (2 ** niveles) con límites holgados y se confirman
+    a resolución completa solo dentro de esas zonas.
+    """
+    if pyramid_levels <= 0:
+        return component_boxes(binarize(gray))
+
+    small = gray
+    for _ in range(pyramid_levels):
+        small = cv2.pyrDown(small)
+    scale = 2 ** pyramid_levels
+    coarse = component_boxes(
+        binarize(small),
+        min_area=MIN_AREA / (scale * scale) / 2,
+        max_area=MAX_AREA / (scale * scale) * 2,
+        min_aspect=MIN_ASPECT_RATIO / 1.5,
+        max_aspect=MAX_ASPECT_RATIO * 1.5,
+    )
+
+    image_height, image_width = gray.shape
+    refined = {}
+    for x, y, w, h in coarse * scale:
+        left, top = max(0, x - scale * 2), max(0, y - scale * 2)
+        right, bottom = min(image_width, x + w + scale * 2), min(image_height, y + h + scale * 2)
+        boxes = component_boxes(binarize(gray[top:bottom, left:right]))
+        for bx, by, bw, bh in boxes:
+            refined[(int(bx + left), int(by + top), int(bw), int(bh))] = True
+    return np.array(list(refined), dtype=np.int64).reshape(-1, 4)
+
+def detect_signature_regions(gray, pyramid_levels=0):
+    """
+    Regiones ampliadas de las firmas candidatas de una imagen de grises.
+    """
+    image_height, image_width = gray.shape
+    return expand_boxes(find_signature_boxes(gray, pyramid_levels), image_width, image_height)
+
+def detect_with_contours(gray):
+    """
+    Detección original (findContours y un bucle por contorno); se conserva para comparar.
+    """
+    contours, _ = cv2.findContours(binarize(gray), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        area = w * h
+        aspect_ratio = w / float(h)
+        if MIN_AREA < area < MAX_AREA and MIN_ASPECT_RATIO < aspect_ratio < MAX_ASPECT_RATIO:
+            boxes.append((x, y, w, h))
+    return boxes, len(contours)
+
+def synthetic_page(noise, width=2480, height=3508, signatures=2, seed=0):
+    """
+    Página de grises (A4 a 300 dpi) con ruido de escaneo y trazos tipo firma.
+    noise es la fracción de píxeles con motas oscuras.
+    """
+    rng = np.random.default_rng(seed)
+    page = np.full((height, width), 255, dtype=np.uint8)
+    specks = rng.random((height, width)) < noise
+    page[specks] = rng.integers(0, 120, size=int(specks.sum()), dtype=np.uint8)
+    for index in range(signatures):
+        x0, y0 = 300 + index * 1100, height - 900
+        points = np.stack([
+            np.linspace(x0, x0 + 300, 40),
+            y0 + 40 * np.sin(np.linspace(0, 6 * np.pi, 40)),
+        ], axis=1).astype(np.int32)
+        cv2.polylines(page, [points], False, 0, thickness=4)
+    return page
+
+def benchmark(noise_levels=(0.0, 0.001, 0.005, 0.02), repeat=3):
+    """
+    Contornos por página frente a latencia (ms) de la detección por contornos, por
+    componentes conexos y por componentes con pirámide, sobre páginas sintéticas.
+    """
+    report = []
+    for noise in noise_levels:
+        gray = synthetic_page(noise)
+        row = {"noise": noise}
+        methods = {
+            "contours": lambda: detect_with_contours(gray)[0],
+            "components": lambda: find_signature_boxes(gray),
+            "components_pyramid": lambda: find_signature_boxes(gray, pyramid_levels=1),
+        }
+        row["contours_found"] = detect_with_contours(gray)[1]
+        for name, method in methods.items():
+            latencies = []
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                candidates = method()
+                latencies.append((time.perf_counter() - start_time) * 1000)
+            row[f"{name}_ms"] = statistics.median(latencies)
+            row[f"{name}_candidates"] = len(candidates)
+        report.append(row)
+    return report
@@ -0,0 +1,42 @@
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+# Ruta tabular para las muestras XML de entrenamiento: cada archivo se lee una vez y sus
+# campos se ubican en columnas con un mapa campo -> columna calculado de antemano, en
+# lugar de buscar cada campo con root.find y rellenar el vector hasta 3x400x400.
+
+TABULAR_FEATURES = 10
+
+class TabularFeatures:
+    """
+    Convierte XML en vectores float32 con una columna por campo del esquema (los primeros
+    TABULAR_FEATURES). Los campos ausentes o no numéricos valen 0.
+    """
+    def __init__(self, field_names, size=TABULAR_FEATURES):
+        self.size = size
+        self.columns = {field: column for column, field in enumerate(field_names[:size])}
+
+    def parse(self, file_path):
+        vector = np.zeros(self.size, dtype=np.float32)
+        seen = set()
+        for element in ET.parse(file_path).getroot():
+            column = self.columns.get(element.tag)
+            if column is None or column in seen:
+                continue  # Igual que root.find: cuenta el primer hijo con ese nombre
+            seen.add(column)
+            try:
+                vector[column] = float(element.text)
+            except (TypeError, ValueError):
+                vector[column] = 0
+        return vector
+
+    def matrix(self, file_paths):
+        """Matriz (archivos, columnas) float32, un XML por fila."""
+        features = np.zeros((len(file_paths), self.size), dtype=np.float32)
+        for row, file_path in enumerate(file_paths):
+            try:
+                features[row] = self.parse(file_path)
+            except Exception as e:
+                print(f"Error procesando archivo {file_path}: {str(e)}")
+        return features
@@ -0,0 +1,167 @@
+import os
+import json
+import hashlib
+
+import numpy as np
+from PIL import Image
+
+from utils import iter_pdf_images
+
+# Caché de entrenamiento preprocesada: cada documento de imagen (primera página del PDF o
+# PNG) se decodifica y redimensiona una sola vez y se guarda como fila uint8 de
+# IMAGE_SIZE x IMAGE_SIZE x 3 en un arreglo en disco por tipo de documento. Un manifiesto
+# JSON guarda ruta, hash del contenido, etiqueta y fila. Al actualizar solo se procesan
+# los archivos nuevos o modificados; el Dataset lee las filas con memmap, sin copias.
+
+IMAGE_SIZE = 400
+CHANNELS = 3
+
+def file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_sample_image(file_path, size=IMAGE_SIZE):
+    """
+    Imagen RGB size x size de un PDF (solo la primera página) o de un PNG.
+    """
+    if file_path.endswith('.pdf'):
+        image = next(iter_pdf_images(file_path, pages=[0]))
+    else:
+        image = Image.open(file_path).convert('RGB')
+    return image.resize((size, size), Image.Resampling.LANCZOS)
+
+class TensorCache:
+    """
+    Filas uint8 (alto, ancho, canales) de un tipo de documento en <cache_dir>/<tipo>.u8
+    con su manifiesto en <cache_dir>/<tipo>_manifest.json.
+    """
+    def __init__(self, cache_dir, document_type, size=IMAGE_SIZE):
+        self.cache_dir = cache_dir
+        self.document_type = document_type
+        self.size = size
+        self.data_path = os.path.join(cache_dir, f"{document_type.lower()}.u8")
+        self.manifest_path = os.path.join(cache_dir, f"{document_type.lower()}_manifest.json")
+        self.entries = {}
+        self.rows = 0
+        self._array = None
+        self._load_manifest()
+
+    @property
+    def row_bytes(self):
+        return self.size * self.size * CHANNELS
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path) or not os.path.exists(self.data_path):
+            return
+        with open(self.manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get("size") != self.size:
+            return  # Otro tamaño de entrada: se reconstruye todo
+        self.entries = {entry["path"]: entry for entry in manifest["entries"]}
+        self.rows = manifest["rows"]
+
+    def _save_manifest(self):
+        manifest = {
+            "document_type": self.document_type,
+            "size": self.size,
+            "rows": self.rows,
+            "entries": list(self.entries.values()),
+        }
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def update(self, file_paths, label):
+        """
+        Agrega al caché los archivos nuevos o modificados y quita los que ya no están.
+        Devuelve cuántos archivos se procesaron.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        wanted = [path for path in file_paths if path.endswith(('.pdf', '.png'))]
+        hashes = {path: file_hash(path) for path in wanted}
+        pending = [
+            path for path in wanted
+            if path not in self.entries or self.entries[path]["hash"] != hashes[path]
+        ]
+        removed = set(self.entries) - set(wanted)
+        for path in removed:
+            del self.entries[path]
+
+        if pending:
+            self._close_array()
+            if not os.path.exists(self.data_path) or self.rows == 0:
+                open(self.data_path, 'wb').close()
+            # La fila se asigna solo cuando la decodificación tuvo éxito; los fallos quedan
+            # en el manifiesto con su hash (sin fila) para no reintentarlos en cada update
+            with open(self.data_path, 'r+b') as f:
+                f.seek(self.rows * self.row_bytes)
+                for path in pending:
+                    try:
+                        image = np.asarray(load_sample_image(path, self.size), dtype=np.uint8)
+                    except Exception as e:
+                        print(f"Error preprocesando {path}: {str(e)}")
+                        self.entries[path] = {"path": path, "hash": hashes[path], "label": label, "row": None}
+                        continue
+                    f.write(image.tobytes())
+                    self.entries[path] = {"path": path, "hash": hashes[path], "label": label, "row": self.rows}
+                    self.rows += 1
+                f.truncate(self.rows * self.row_bytes)
+
+        if pending or removed:
+            if self.rows > 2 * len(self.cached_entries()):
+                self.compact()
+            self._save_manifest()
+            print(f"Caché de {self.document_type}: {len(pending)} procesados, {len(removed)} eliminados, {len(self.entries)} en total")
+        return len(pending)
+
+    def compact(self):
+        """
+        Reescribe el arreglo solo con las filas vigentes (tras muchas modificaciones).
+        """
+        self._close_array()
+        source = np.memmap(self.data_path, dtype=np.uint8, mode='r',
+                           shape=(self.rows, self.size, self.size, CHANNELS))
+        temp_path = self.data_path + ".tmp"
+        entries = sorted(self.cached_entries(), key=lambda entry: entry["row"])
+        target = np.memmap(temp_path, dtype=np.uint8, mode='w+',
+                           shape=(max(len(entries), 1), self.size, self.size, CHANNELS))
+        for new_row, entry in enumerate(entries):
+            target[new_row] = source[entry["row"]]
+            entry["row"] = new_row
+        target.flush()
+        del source, target
+        os.replace(temp_path, self.data_path)
+        self.rows = len(entries)
+
+    def cached_entries(self):
+        """Entradas con fila en el arreglo (sin los archivos que no se pudieron decodificar)."""
+        return [entry for entry in self.entries.values() if entry["row"] is not None]
+
+    def _close_array(self):
+        self._array = None
+
+    @property
+    def array(self):
+        # Copy-on-write: las filas se leen sin copiar y el archivo nunca se modifica
+        if self._array is None:
+            self._array = np.memmap(self.data_path, dtype=np.uint8, mode='c',
+                                    shape=(self.rows, self.size, self.size, CHANNELS))
+        return self._array
+
+    def row(self, file_path):
+        entry = self.entries.get(file_path)
+        return entry["row"] if entry else None  # None también para archivos que fallaron
+
+    def sample(self, row):
+        """Fila como arreglo (alto, ancho, canales) uint8, vista sobre el memmap."""
+        return self.array[row]
+
+    def __getstate__(self):
+        # Los workers del DataLoader vuelven a abrir el memmap
+        state = self.__dict__.copy()
+        state["_array"] = None
+        return state
@@ -0,0 +1,183 @@
+import os
+import time
+import contextlib
+
+import torch
+import torch.nn as nn
+
+# Configuración del entrenamiento según el dispositivo. En CUDA se usa AMP (float16 con
+# GradScaler); en CPU, autocast en bfloat16 sin escalador, formato channels_last y
+# torch.compile cuando está disponible, con los hilos de PyTorch fijados explícitamente.
+#
+# Variables de entorno (todas opcionales):
+#   TRAIN_PRECISION=auto|fp32|bf16|fp16   TRAIN_CHANNELS_LAST=1|0   TRAIN_COMPILE=1|0
+#   TRAIN_THREADS=N   TRAIN_INTEROP_THREADS=N
+
+PRECISIONS = {"fp32": None, "bf16": torch.bfloat16, "fp16": torch.float16}
+
+def env_flag(name, default):
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.lower() in ("1", "true", "yes", "si")
+
+def configure_threads(intra_op=None, inter_op=None):
+    """
+    Fija los hilos de PyTorch (por defecto TRAIN_THREADS / TRAIN_INTEROP_THREADS).
+    """
+    intra_op = intra_op or int(os.getenv("TRAIN_THREADS", "0"))
+    inter_op = inter_op or int(os.getenv("TRAIN_INTEROP_THREADS", "0"))
+    if intra_op:
+        torch.set_num_threads(intra_op)
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            # Solo se puede fijar antes del primer trabajo paralelo
+            print("No se pudo cambiar el número de hilos inter-op (ya se inició el paralelismo)")
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+class CompiledRunner:
+    """
+    Invoca el modelo compilado y, si falla, el original. torch.compile es perezoso: los
+    errores de compilación aparecen en el primer forward, no al llamar a torch.compile.
+    """
+    def __init__(self, model, compiled):
+        self.model = model
+        self.compiled = compiled
+
+    def __call__(self, *args, **kwargs):
+        if self.compiled is not None:
+            try:
+                return self.compiled(*args, **kwargs)
+            except Exception as e:
+                print(f"torch.compile falló, se continúa con el modelo sin compilar: {str(e)}")
+                self.compiled = None
+        return self.model(*args, **kwargs)
+
+class DeviceStrategy:
+    """
+    Precisión, formato de memoria y compilación para entrenar en device.
+    """
+    def __init__(self, device, precision=None, channels_last=None, compile_model=None):
+        self.device = torch.device(device)
+        is_cuda = self.device.type == "cuda"
+
+        precision = precision or os.getenv("TRAIN_PRECISION", "auto")
+        if precision == "auto":
+            precision = "fp16" if is_cuda else "bf16"
+        if precision == "fp16" and not is_cuda:
+            precision = "bf16"  # float16 con autocast solo tiene sentido en CUDA
+        self.precision = precision
+        self.dtype = PRECISIONS[precision]
+
+        self.channels_last = env_flag("TRAIN_CHANNELS_LAST", not is_cuda) if channels_last is None else channels_last
+        self.compile_model = env_flag("TRAIN_COMPILE", False) if compile_model is None else compile_model
+        self.scaler = torch.amp.GradScaler("cuda", enabled=is_cuda and precision == "fp16")
+
+    def describe(self):
+        return {
+            "device": self.device.type,
+            "precision": self.precision,
+            "channels_last": self.channels_last,
+            "compile": self.compile_model,
+        }
+
+    def autocast(self):
+        if self.dtype is None:
+            return contextlib.nullcontext()
+        return torch.autocast(device_type=self.device.type, dtype=self.dtype)
+
+    def prepare_model(self, model):
+        """
+        Mueve el modelo al dispositivo y devuelve el módulo a invocar (compilado si aplica).
+        Los checkpoints se guardan siempre desde el modelo original.
+        """
+        model.to(self.device)
+        if self.channels_last:
+            model.to(memory_format=torch.channels_last)
+        if self.compile_model and hasattr(torch, "compile"):
+            try:
+                return CompiledRunner(model, torch.compile(model))
+            except Exception as e:
+                print(f"torch.compile no disponible, se usa el modelo sin compilar: {str(e)}")
+        return model
+
+    def prepare_inputs(self, inputs):
+        inputs = inputs.to(self.device, non_blocking=True)
+        if self.channels_last and inputs.dim() == 4:
+            inputs = inputs.contiguous(memory_format=torch.channels_last)
+        return inputs
+
+    def backward(self, loss, optimizer):
+        optimizer.zero_grad(set_to_none=True)
+        self.scaler.scale(loss).backward()
+
+    def optimizer_step(self, optimizer):
+        self.scaler.step(optimizer)
+        self.scaler.update()
+
+    def backward_step(self, loss, optimizer):
+        self.backward(loss, optimizer)
+        self.optimizer_step(optimizer)
+
+def benchmark_configurations(device=None):
+    """Configuraciones a comparar en el dispositivo."""
+    device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+    if device.type == "cuda":
+        precisions = ["fp32", "fp16"]
+    else:
+        precisions = ["fp32", "bf16"]
+    configurations = []
+    for precision in precisions:
+        for channels_last in (False, True):
+            for compile_model in (False, True):
+                configurations.append({
+                    "precision": precision,
+                    "channels_last": channels_last,
+                    "compile_model": compile_model,
+                })
+    return device, configurations
+
+def benchmark(batch_size=16, steps=10, warmup=3, image_size=400, threads=None):
+    """
+    Imágenes por segundo de un paso de entrenamiento de DocumentCNN (datos sintéticos)
+    con cada combinación de precisión, channels_last y torch.compile.
+    """
+    from model import DocumentCNN
+
+    configure_threads(threads)
+    device, configurations = benchmark_configurations()
+    inputs = torch.rand(batch_size, 3, image_size, image_size)
+    targets = torch.randint(0, 3, (batch_size,))
+    criterion = nn.CrossEntropyLoss()
+
+    report = []
+    for configuration in configurations:
+        strategy = DeviceStrategy(device, **configuration)
+        model = DocumentCNN(num_classes=3)
+        runner = strategy.prepare_model(model)
+        optimizer = torch.optim.AdamW(model.parameters(), lr=0.001)
+        batch = strategy.prepare_inputs(inputs)
+        labels = targets.to(device)
+
+        row = {**strategy.describe(), "threads": torch.get_num_threads()}
+        try:
+            model.train()
+            for step in range(warmup + steps):
+                if step == warmup:
+                    if device.type == "cuda":
+                        torch.cuda.synchronize()
+                    start_time = time.perf_counter()
+                with strategy.autocast():
+                    loss = criterion(runner(batch), labels)
+                strategy.backward_step(loss, optimizer)
+            if device.type == "cuda":
+                torch.cuda.synchronize()
+            elapsed = time.perf_counter() - start_time
+            row["images_per_sec"] = batch_size * steps / elapsed
+        except Exception as e:
+            row["error"] = str(e)
+        print(row)
+        report.append(row)
+    return report
@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import resource
+import contextlib
+
+import torch
+
+# Instrumentación del entrenamiento: por época y por fase (train/val) mide el tiempo
+# bloqueado esperando al DataLoader, la copia al dispositivo, forward, backward y el paso
+# del optimizador, las muestras por segundo y el pico de memoria (RSS). Opcionalmente
+# guarda una traza de torch.profiler para una ventana de pasos.
+#
+# Variables de entorno (opcionales):
+#   TRAIN_PROFILE_STEPS=N   pasos a perfilar (0 = sin traza)
+#   TRAIN_PROFILE_START=N   pasos de entrenamiento a saltar antes de la ventana
+
+PHASE_TIMERS = ("data_wait", "host_to_device", "forward", "backward", "optimizer")
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Pico de memoria residente en MB (ru_maxrss está en KB en Linux y en bytes en macOS)."""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class PhaseTimer:
+    """
+    Acumula tiempos de una fase de una época. En CUDA sincroniza al cerrar cada intervalo
+    para que el tiempo se atribuya a la operación que lo consumió y no a la siguiente.
+    """
+    def __init__(self, device):
+        self.synchronize = torch.device(device).type == "cuda"
+        self.totals = dict.fromkeys(PHASE_TIMERS, 0.0)
+        self.samples = 0
+        self.steps = 0
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.synchronize:
+                torch.cuda.synchronize()
+            self.totals[name] += time.perf_counter() - start
+
+    def iterate(self, loader):
+        """Recorre loader midiendo el tiempo de espera de cada lote."""
+        iterator = iter(loader)
+        while True:
+            start = time.perf_counter()
+            try:
+                batch = next(iterator)
+            except StopIteration:
+                return
+            self.totals["data_wait"] += time.perf_counter() - start
+            yield batch
+
+    def count(self, batch_size):
+        self.samples += batch_size
+        self.steps += 1
+
+    def summary(self):
+        elapsed = time.perf_counter() - self._start
+        metrics = {name: round(value, 4) for name, value in self.totals.items()}
+        metrics.update({
+            "wall_time": round(elapsed, 4),
+            "samples": self.samples,
+            "steps": self.steps,
+            "samples_per_sec": round(self.samples / elapsed, 2) if elapsed > 0 else 0.0,
+        })
+        return metrics
+
+def epoch_metrics(epoch, train_timer, val_timer):
+    return {
+        "epoch": epoch + 1,
+        "train": train_timer.summary(),
+        "val": val_timer.summary(),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        # Workers del DataLoader ya terminados (con persistent_workers, al final del fold)
+        "peak_rss_children_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+    }
+
+class StepProfiler:
+    """
+    Traza de torch.profiler (formato Chrome) para TRAIN_PROFILE_STEPS pasos de
+    entrenamiento después de TRAIN_PROFILE_START. Sin pasos configurados no hace nada.
+    """
+    def __init__(self, trace_path, steps=None, start=None):
+        self.trace_path = trace_path
+        self.steps = int(os.getenv("TRAIN_PROFILE_STEPS", "0")) if steps is None else steps
+        self.start = int(os.getenv("TRAIN_PROFILE_START", "1")) if start is None else start
+        self._profiler = None
+
+    def __enter__(self):
+        if self.steps <= 0 or not self.trace_path:
+            return self
+        from torch.profiler import profile, schedule, ProfilerActivity
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        self._profiler = profile(
+            activities=activities,
+            schedule=schedule(skip_first=self.start, wait=0, warmup=1, active=self.steps, repeat=1),
+            on_trace_ready=self._export,
+            record_shapes=True,
+            profile_memory=True,
+        )
+        self._profiler.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._profiler is not None:
+            self._profiler.__exit__(*exc_info)
+            self._profiler = None
+        return False
+
+    def step(self):
+        if self._profiler is not None:
+            self._profiler.step()
+
+    def _export(self, profiler):
+        profiler.export_chrome_trace(self.trace_path)
+        print(f"Traza del profiler guardada en {self.trace_path}")
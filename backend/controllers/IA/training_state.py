@@ -0,0 +1,65 @@
+import os
+import time
+import random
+
+import numpy as np
+import torch
+
+# Checkpoints completos del estado de entrenamiento (modelo, optimizador, scheduler,
+# escalador, EarlyStopping, época, historial, partición y estados de los generadores
+# aleatorios) para reanudar un fold interrumpido exactamente donde quedó. Se escriben
+# de forma atómica: archivo temporal y os.replace, nunca un checkpoint a medias.
+
+def atomic_save(obj, path):
+    temp_path = f"{path}.tmp.{os.getpid()}"
+    torch.save(obj, temp_path)
+    os.replace(temp_path, path)
+
+def capture_rng_state():
+    state = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+def restore_rng_state(state):
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+
+def load_training_state(path):
+    """Estado guardado por train_model (con atomic_save), o None si no existe."""
+    if not os.path.exists(path):
+        return None
+    # Incluye estados de numpy/random: no es solo un state_dict de tensores
+    return torch.load(path, map_location="cpu", weights_only=False)
+
+class CheckpointSchedule:
+    """
+    Decide cuándo guardar: al final de cada every_epochs épocas, o cada every_minutes
+    minutos aunque sea a mitad de una época (train_model consulta minutes_due en cada
+    paso). TRAIN_CHECKPOINT_EPOCHS / TRAIN_CHECKPOINT_MINUTES por defecto; un 0 desactiva
+    ese criterio.
+    """
+    def __init__(self, every_epochs=None, every_minutes=None):
+        self.every_epochs = int(os.getenv("TRAIN_CHECKPOINT_EPOCHS", "1")) if every_epochs is None else every_epochs
+        self.every_minutes = float(os.getenv("TRAIN_CHECKPOINT_MINUTES", "0")) if every_minutes is None else every_minutes
+        self._last_save = time.time()
+
+    def due(self, epoch):
+        """Al terminar la época epoch."""
+        if self.every_epochs and (epoch + 1) % self.every_epochs == 0:
+            return True
+        return self.minutes_due()
+
+    def minutes_due(self):
+        """En cualquier paso: pasaron every_minutes desde el último guardado."""
+        return bool(self.every_minutes) and time.time() - self._last_save >= self.every_minutes * 60
+
+    def saved(self):
+        self._last_save = time.time()
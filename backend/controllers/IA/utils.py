@@ -3,6 +3,8 @@ import json
 import fitz
 from PIL import Image
 
+from schema_registry import get_document_schema
+
 def calculate_confidence(regex_match):
     if regex_match is None:
         return 0.0
@@ -12,22 +14,35 @@ def calculate_confidence(regex_match):
     return 0.5
 
 def load_document_schema():
-    schema_path = os.path.join(os.path.dirname(__file__), '..', 'schemas.json')
-    with open(schema_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    # Esquema cacheado y con regex precompilados; se recarga solo si schemas.json cambia
+    return get_document_schema()
 
 
-def convert_pdf_to_images(pdf_path):
+def render_pdf_page(page, dpi=None, grayscale=False, clip=None):
+    """
+    Renderiza una página de PyMuPDF a imagen PIL con la resolución, el espacio de color
+    y el recorte (en coordenadas de página) indicados.
+    """
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    pix = page.get_pixmap(dpi=dpi, colorspace=colorspace, clip=fitz.Rect(clip) if clip else None, alpha=False)
+    return Image.frombytes("L" if grayscale else "RGB", [pix.width, pix.height], pix.samples)
+
+def iter_pdf_images(pdf_path, pages=None, dpi=None, grayscale=False, clip=None):
+    """
+    Genera las páginas del PDF como imágenes de una en una, renderizando solo las
+    páginas pedidas (índices desde 0) y, si se indica, solo la región clip.
+    """
+    doc = fitz.open(pdf_path)
     try:
-        doc = fitz.open(pdf_path)
-        images = []
-        for page_num in range(doc.page_count):
-            page = doc.load_page(page_num)
-            pix = page.get_pixmap()
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            images.append(img)
-        doc.close()
-        return images
+        page_numbers = range(doc.page_count) if pages is None else pages
+        for page_num in page_numbers:
+            if 0 <= page_num < doc.page_count:
+                yield render_pdf_page(doc.load_page(page_num), dpi=dpi, grayscale=grayscale, clip=clip)
     except Exception as e:
         print(f"Error convirtiendo PDF a imágenes: {str(e)}")
         raise
+    finally:
+        doc.close()
+
+def convert_pdf_to_images(pdf_path):
+    return list(iter_pdf_images(pdf_path))
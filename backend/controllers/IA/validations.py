@@ -1,9 +1,12 @@
+import os
 import re
 from datetime import datetime
-from PIL import ImageOps, ImageChops, Image
 
 from utils import convert_pdf_to_images
-from extractions import extract_text_from_document, extract_section, extract_images_from_pdf, extract_text_near_signature
+from extractions import extract_text_from_document, extract_section, extract_text_near_signature, placement_box
+
+# Densidad mínima de tinta en el recuadro para considerar que hay una firma
+SIGNATURE_INK_THRESHOLD = float(os.getenv("SIGNATURE_INK_THRESHOLD", "0.005"))
 
 # Contract
 def validate_order_number(order_number):
@@ -169,39 +172,40 @@ def validate_totals_logic(extracted_data, table_data):
 
     return valid, errors
 
-def validate_signatures_and_positions(document_path, schema, field_key):
+def validate_signatures_and_positions(document, schema, field_key):
     extracted_data = {}
     missing_fields = []
 
     try:
-        images = extract_images_from_pdf(document_path)
+        placements = document.image_placements()
     except Exception as e:
         return {}, [f"Error extrayendo imágenes del PDF: {e}"]
 
-    # Acceder correctamente al campo "signatures"
-    signature_fields = schema["Contract"]["fields"]["signatures"]["fields"]
+    document_type = "Contract"
+    signature_fields = schema[document_type]["fields"][field_key]["fields"]
 
     for idx, signature_field in enumerate(["first_person_signature", "second_person_signature"]):
-        if idx < len(images):
+        if idx < len(placements):
+            placement = placements[idx]
+            box = placement_box(placement, signature_fields[signature_field]["region"])
             # Verificar si hay una firma presente en la región
-            if verify_signature_in_image(images[idx]["image"], idx):
-                extracted_data[signature_field] = f"Firma detectada en página {images[idx]['page']} imagen {images[idx]['index']}"
-                text_near_signature = extract_text_near_signature(images[idx]["image"], idx)
+            if verify_signature_in_image(document, placement, box):
+                extracted_data[signature_field] = f"Firma detectada en página {placement['page']} imagen {placement['index']}"
+                text_near_signature = extract_text_near_signature(document, placement["page"] - 1, box)
                 if text_near_signature:
                     # Validar y extraer nombre y posición
                     name_field = "first_person_name" if idx == 0 else "second_person_name"
                     position_field = "first_person_position" if idx == 0 else "second_person_position"
 
                     # Validar nombre
-                    match = re.search(signature_fields[name_field]["regex"], text_near_signature)
+                    match = schema.pattern(document_type, f"signatures.{name_field}").search(text_near_signature)
                     if match:
                         extracted_data[name_field] = match.group(0).strip()
                     else:
                         missing_fields.append(name_field)
 
                     # Validar posición
-                    valid_positions = signature_fields[position_field]["values"]
-                    position_match = re.search(r"\b(" + "|".join(map(re.escape, valid_positions)) + r")\b", text_near_signature, re.IGNORECASE)
+                    position_match = schema.values_pattern(document_type, f"signatures.{position_field}").search(text_near_signature)
                     if position_match:
                         extracted_data[position_field] = position_match.group(0).strip()
                     else:
@@ -213,25 +217,28 @@ def validate_signatures_and_positions(document_path, schema, field_key):
 
     return extracted_data, missing_fields
 
-def verify_signature_in_image(image, position_index):
+def signature_score(document, placement, box):
     """
-    Verifica si una firma está presente en una región específica de la imagen.
+    Densidad de tinta del recuadro box (coordenadas de página, ya dentro de la imagen
+    incrustada de placement), medida con las integrales de tinta de la página.
     """
-    signature_regions = [
-        (50, 600, 450, 900),  # Primera firma y texto relacionado (ampliada hacia arriba y abajo)
-        (500, 600, 850, 900)  # Segunda firma y texto relacionado (ampliada hacia arriba y abajo)
-    ]
+    if box is None:
+        return 0.0  # La región no cae sobre la imagen dibujada
+    return document.ink_map(placement["page"] - 1).score(box)
 
+def verify_signature_in_image(document, placement, box, threshold=None):
+    """
+    Verifica si hay una firma en el recuadro: su puntaje de tinta debe alcanzar el umbral
+    (SIGNATURE_INK_THRESHOLD por defecto).
+    """
+    threshold = SIGNATURE_INK_THRESHOLD if threshold is None else threshold
     try:
-        region = signature_regions[position_index]
-        cropped_region = image.crop(region)
-        gray_region = ImageOps.grayscale(cropped_region)
-        if ImageChops.difference(gray_region, Image.new("L", gray_region.size, 255)).getbbox():
-            return True
+        return signature_score(document, placement, box) >= threshold
     except Exception as e:
-        print(f"Error al verificar la firma en la posición {position_index}: {str(e)}")
+        print(f"Error al verificar la firma en la página {placement['page']}: {str(e)}")
     return False
 
+
 def validate_provider_intro(provider_info_intro):
     expected_intro = "Información de la Compañía"
     expected_intro_english = "Company Information"
@@ -286,7 +293,7 @@ def validate_provider_transaction(provider_transaction):
     return True, None
 
 # Services delivery record
-def validate_signatures_and_positions_record(document_path, schema, field_key):
+def validate_signatures_and_positions_record(document, schema, field_key):
     """
     Valida y extrae información sobre las firmas en un documento de tipo ServiceDeliveryRecord.
     """
@@ -294,19 +301,21 @@ def validate_signatures_and_positions_record(document_path, schema, field_key):
     missing_fields = []
 
     try:
-        images = extract_images_from_pdf(document_path)
+        placements = document.image_placements()
     except Exception as e:
         return {}, [f"Error extrayendo imágenes del PDF: {e}"]
 
-    # Acceder correctamente al campo "signatures"
-    signature_fields = schema["ServiceDeliveryRecord"]["fields"]["signatures"]["fields"]
+    document_type = "ServiceDeliveryRecord"
+    signature_fields = schema[document_type]["fields"][field_key]["fields"]
 
     for idx, signature_field in enumerate(["person_signature"]):
-        if idx < len(images):
+        if idx < len(placements):
+            placement = placements[idx]
+            box = placement_box(placement, signature_fields[signature_field]["region"])
             # Verificar si hay una firma presente en la región
-            if verify_signature_in_image_record(images[idx]["image"], idx):
-                extracted_data[signature_field] = f"Firma detectada en página {images[idx]['page']} imagen {images[idx]['index']}"
-                text_near_signature = extract_text_near_signature(images[idx]["image"], idx)
+            if verify_signature_in_image_record(document, placement, box):
+                extracted_data[signature_field] = f"Firma detectada en página {placement['page']} imagen {placement['index']}"
+                text_near_signature = extract_text_near_signature(document, placement["page"] - 1, box)
                 if text_near_signature:
                     # Validar y extraer nombre y posición
                     name_field = "person_name"
@@ -314,22 +323,21 @@ def validate_signatures_and_positions_record(document_path, schema, field_key):
                     company_field = "person_company"
 
                     # Validar nombre
-                    match = re.search(signature_fields[name_field]["regex"], text_near_signature)
+                    match = schema.pattern(document_type, f"signatures.{name_field}").search(text_near_signature)
                     if match:
                         extracted_data[name_field] = match.group(0).strip()
                     else:
                         missing_fields.append(name_field)
 
                     # Validar posición
-                    valid_positions = signature_fields[position_field]["values"]
-                    position_match = re.search(r"\b(" + "|".join(map(re.escape, valid_positions)) + r")\b", text_near_signature, re.IGNORECASE)
+                    position_match = schema.values_pattern(document_type, f"signatures.{position_field}").search(text_near_signature)
                     if position_match:
                         extracted_data[position_field] = position_match.group(0).strip()
                     else:
                         missing_fields.append(position_field)
 
                     # Validar compañía
-                    company_match = re.search(signature_fields[company_field]["regex"], text_near_signature)
+                    company_match = schema.pattern(document_type, f"signatures.{company_field}").search(text_near_signature)
                     if company_match:
                         extracted_data[company_field] = company_match.group(1).strip()
                     else:
@@ -341,23 +349,11 @@ def validate_signatures_and_positions_record(document_path, schema, field_key):
 
     return extracted_data, missing_fields
 
-def verify_signature_in_image_record(image, position_index):
+def verify_signature_in_image_record(document, placement, box):
     """
-    Verifica si una firma está presente en una región específica de la imagen.
+    Verifica si hay una firma en el recuadro del acta (mismo criterio que en contratos).
     """
-    signature_regions = [
-        (50, 600, 450, 900)
-    ]
-
-    try:
-        region = signature_regions[position_index]
-        cropped_region = image.crop(region)
-        gray_region = ImageOps.grayscale(cropped_region)
-        if ImageChops.difference(gray_region, Image.new("L", gray_region.size, 255)).getbbox():
-            return True
-    except Exception as e:
-        print(f"Error al verificar la firma en la posición {position_index}: {str(e)}")
-    return False
+    return verify_signature_in_image(document, placement, box)
 
 # Invoice
 def validate_tax_id(extracted_value):
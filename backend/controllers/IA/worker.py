@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import traceback
+from contextlib import redirect_stdout
+
+from process import process_single_document
+
+# Modo worker persistente: recibe una solicitud JSON por línea en stdin y responde
+# una línea JSON en stdout. Todo lo que el procesamiento imprime se envía a stderr
+# para que stdout quede reservado para el protocolo.
+
+WARMUP_TEXT = (
+    "1. Company Information\nName: Warm Up\nRUC: 0000000000000\n"
+    "2. Client Information\nName: Warm Up\nRUC: 0000000000000\n"
+)
+
+def warm_up():
+    """
+    Procesa un documento de prueba de cada tipo para dejar cargadas las librerías pesadas.
+    """
+    import fitz
+
+    start_time = time.time()
+    fd, warmup_path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((72, 72), WARMUP_TEXT)
+        doc.save(warmup_path)
+        doc.close()
+
+        for document_type in ["Contract", "ServiceDeliveryRecord", "Invoice"]:
+            process_single_document(warmup_path, document_type, "0000000000000", "0000000", "00000000")
+    except Exception as e:
+        print(f"Error durante el calentamiento del worker: {str(e)}")
+    finally:
+        os.remove(warmup_path)
+
+    return time.time() - start_time
+
+def handle_request(request):
+    """
+    Procesa una solicitud del protocolo y devuelve la respuesta correspondiente.
+    """
+    request_id = request.get("id")
+    if request.get("command") == "stats":
+        from ocr_cache import get_ocr_cache_stats
+        return {"id": request_id, "result": {"ocr_cache": get_ocr_cache_stats()}}
+
+    try:
+        result = process_single_document(
+            request["file_path"],
+            request["document_type"],
+            request["ruc"],
+            request["auxiliar"],
+            request.get("auxiliar_hes"),
+        )
+        return {"id": request_id, "result": result}
+    except Exception as e:
+        return {"id": request_id, "error": str(e), "traceback": traceback.format_exc()}
+
+def serve(input_stream=None, output_stream=None, warmup=True):
+    """
+    Atiende solicitudes JSON-lines hasta que se cierre la entrada.
+    """
+    input_stream = input_stream or sys.stdin
+    output_stream = output_stream or sys.stdout
+
+    def send(message):
+        output_stream.write(json.dumps(message, ensure_ascii=False) + "\n")
+        output_stream.flush()
+
+    with redirect_stdout(sys.stderr):
+        warmup_time = warm_up() if warmup else 0.0
+        print(f"Worker de IA listo (pid {os.getpid()}, calentamiento {warmup_time:.2f}s)")
+        send({"ready": True, "pid": os.getpid(), "warmup_time": warmup_time})
+
+        for line in input_stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                send({"id": None, "error": f"Solicitud inválida: {str(e)}"})
+                continue
+            send(handle_request(request))
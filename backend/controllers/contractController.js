@@ -4,7 +4,7 @@
     version: 2.5.9
 */
 const Contract = require('../models/Contract');
-const { spawn } = require('child_process');
+const { spawnIA } = require('../helpers/iaWorkerHelper');
 const path = require('path');
 const authMiddleware = require('../middleware/authMiddleware');
 const DocsMetrics = require('../models/DocsMetrics');
@@ -39,22 +39,12 @@ exports.createContract = [
 			await newContract.save();
 
 			const filePath = path.join(process.cwd(), newContract.file_path);
-			const pythonProcess = spawn(
-				'python3',
-				[
-					'controllers/IA/ia.py',
-					filePath,
-					documentType,
-					req.body.ruc,
-					req.body.contract,
-				],
-				{
-					env: {
-						...process.env,
-						TESSDATA_PREFIX: process.env.TESSDATA_PREFIX,
-					},
-				},
-			);
+			const pythonProcess = spawnIA([
+				filePath,
+				documentType,
+				req.body.ruc,
+				req.body.contract,
+			]);
 
 			let pythonOutput = '';
 			let pythonError = '';
@@ -256,22 +246,12 @@ exports.updateContract = [
             if (isIARequired) {
                 console.log('Iniciando validación con IA...');
 
-                const pythonProcess = spawn(
-                    'python3',
-                    [
-                        'controllers/IA/ia.py',
-                        filePath,
-                        documentType,
-                        ruc,
-                        contract,
-                    ],
-                    {
-                        env: {
-                            ...process.env,
-                            TESSDATA_PREFIX: process.env.TESSDATA_PREFIX,
-                        },
-                    }
-                );
+                const pythonProcess = spawnIA([
+                    filePath,
+                    documentType,
+                    ruc,
+                    contract,
+                ]);
 
                 let pythonOutput = '';
                 let pythonError = '';
@@ -4,7 +4,7 @@
     version: 3.1.7
 */
 const Invoice = require('../models/Invoice');
-const { spawn } = require('child_process');
+const { spawnIA } = require('../helpers/iaWorkerHelper');
 const path = require('path');
 const authMiddleware = require('../middleware/authMiddleware');
 const Contract = require('../models/Contract');
@@ -50,22 +50,12 @@ exports.createInvoice = [
 			}
 
 			const filePath = path.join(process.cwd(), newInvoice.file_path);
-			const pythonProcess = spawn(
-				'python3',
-				[
-					'controllers/IA/ia.py',
-					filePath,
-					documentType,
-					req.body.ruc,
-					req.body.contract,
-				],
-				{
-					env: {
-						...process.env,
-						TESSDATA_PREFIX: process.env.TESSDATA_PREFIX,
-					},
-				},
-			);
+			const pythonProcess = spawnIA([
+				filePath,
+				documentType,
+				req.body.ruc,
+				req.body.contract,
+			]);
 
             let pythonOutput = '';
             let pythonError = '';
@@ -279,22 +269,12 @@ exports.updateInvoice = [
             if (isIARequired) {
                 console.log('Iniciando validación con IA...');
 
-                const pythonProcess = spawn(
-                    'python3',
-                    [
-                        'controllers/IA/ia.py',
-                        filePath,
-                        documentType,
-                        ruc,
-                        contract,
-                    ],
-                    {
-                        env: {
-                            ...process.env,
-                            TESSDATA_PREFIX: process.env.TESSDATA_PREFIX,
-                        },
-                    }
-                );
+                const pythonProcess = spawnIA([
+                    filePath,
+                    documentType,
+                    ruc,
+                    contract,
+                ]);
 
                 let pythonOutput = '';
                 let pythonError = '';
@@ -4,7 +4,7 @@
     version: 1.0
 */
 const ServiceDeliveryRecord = require('../models/ServiceDeliveryRecord');
-const { spawn } = require('child_process');
+const { spawnIA } = require('../helpers/iaWorkerHelper');
 const path = require('path');
 const authMiddleware = require('../middleware/authMiddleware');
 const Document = require('../models/Document');
@@ -56,23 +56,13 @@ exports.createServiceRecord = [
             }            
 
             const filePath = path.join(process.cwd(), newRecord.file_path);
-            const pythonProcess = spawn(
-                'python3',
-                [
-                    'controllers/IA/ia.py',
-                    filePath,
-                    documentType,
-                    ruc,
-                    contractNumber.contract_number,
-                    hes,
-                ],
-                {
-                    env: {
-                        ...process.env,
-                        TESSDATA_PREFIX: process.env.TESSDATA_PREFIX,
-                    },
-                },
-            );
+            const pythonProcess = spawnIA([
+                filePath,
+                documentType,
+                ruc,
+                contractNumber.contract_number,
+                hes,
+            ]);
 
             let pythonOutput = '';
             let pythonError = '';
@@ -300,23 +290,13 @@ exports.updateServiceRecord = [
             console.log(`Invocando la IA con archivo: ${filePath}, documento: ${documentType}, ruc: ${ruc}, contrato: ${contract.contract_number}, HES: ${hes}`);
 
             const fileFullPath = path.join(process.cwd(), filePath);
-            const pythonProcess = spawn(
-                'python3',
-                [
-                    'controllers/IA/ia.py',
-                    fileFullPath,
-                    documentType,
-                    ruc,
-                    contract.contract_number,
-                    hes,
-                ],
-                {
-                    env: {
-                        ...process.env,
-                        TESSDATA_PREFIX: process.env.TESSDATA_PREFIX,
-                    },
-                }
-            );
+            const pythonProcess = spawnIA([
+                fileFullPath,
+                documentType,
+                ruc,
+                contract.contract_number,
+                hes,
+            ]);
 
             let pythonOutput = '';
             let pythonError = '';
@@ -0,0 +1,201 @@
+/*
+    Description: Pool of persistent IA workers (ia.py serve) that replaces spawning ia.py per document.
+    By: Fabiana Liria y Mateo Ávila
+    version: 1.0.0
+*/
+const { spawn } = require('child_process');
+const EventEmitter = require('events');
+const readline = require('readline');
+
+const IA_SCRIPT = 'controllers/IA/ia.py';
+const POOL_SIZE = parseInt(process.env.IA_WORKERS ?? '2', 10);
+const RESTART_DELAY_MS = 1000;
+const MAX_RESTART_DELAY_MS = 60000;
+const JOB_TIMEOUT_MS = parseInt(process.env.IA_JOB_TIMEOUT_MS ?? '300000', 10);
+
+const workers = [];
+const restartFailures = [];
+const queue = [];
+let nextRequestId = 1;
+
+const pythonEnv = () => ({
+	...process.env,
+	TESSDATA_PREFIX: process.env.TESSDATA_PREFIX,
+});
+
+const finishJob = (job, code, output, error) => {
+	if (output) {
+		job.proc.stdout.emit('data', Buffer.from(output));
+	}
+	if (error) {
+		job.proc.stderr.emit('data', Buffer.from(error));
+	}
+	job.proc.emit('close', code);
+};
+
+const dispatch = () => {
+	workers.forEach(worker => {
+		if (!worker || !worker.ready || worker.current || queue.length === 0) {
+			return;
+		}
+		const job = queue.shift();
+		worker.current = job;
+		if (JOB_TIMEOUT_MS > 0) {
+			// A wedged Python process must not block its HTTP request forever
+			job.timer = setTimeout(() => {
+				if (worker.current !== job) {
+					return;
+				}
+				worker.current = null;
+				finishJob(
+					job,
+					1,
+					'',
+					`El worker de IA no respondió en ${JOB_TIMEOUT_MS} ms`,
+				);
+				console.error(
+					`[IA worker ${worker.index}] Tiempo agotado, reiniciando worker`,
+				);
+				worker.child.kill('SIGKILL');
+			}, JOB_TIMEOUT_MS);
+		}
+		worker.child.stdin.write(`${JSON.stringify(job.request)}\n`);
+	});
+};
+
+const failQueuedJobs = message => {
+	while (queue.length > 0) {
+		finishJob(queue.shift(), 1, '', message);
+	}
+};
+
+const handleLine = (worker, line) => {
+	let message;
+	try {
+		message = JSON.parse(line);
+	} catch (error) {
+		console.error(`[IA worker ${worker.index}] Salida no válida:`, line);
+		return;
+	}
+
+	if (message.ready) {
+		worker.ready = true;
+		restartFailures[worker.index] = 0;
+		console.log(
+			`[IA worker ${worker.index}] listo en ${message.warmup_time.toFixed(2)}s`,
+		);
+		dispatch();
+		return;
+	}
+
+	const job = worker.current;
+	if (!job || message.id !== job.request.id) {
+		console.error(`[IA worker ${worker.index}] Respuesta inesperada:`, line);
+		return;
+	}
+
+	worker.current = null;
+	clearTimeout(job.timer);
+	if (message.error) {
+		finishJob(job, 1, '', message.error);
+	} else {
+		finishJob(job, 0, JSON.stringify(message.result, null, 2), '');
+	}
+	dispatch();
+};
+
+const startWorker = index => {
+	const child = spawn('python3', [IA_SCRIPT, 'serve'], { env: pythonEnv() });
+	const worker = { index, child, ready: false, current: null };
+
+	readline
+		.createInterface({ input: child.stdout })
+		.on('line', line => handleLine(worker, line));
+
+	child.stdin.on('error', error => {
+		// EPIPE when the child died; 'close' takes care of the job and the restart
+		console.error(`[IA worker ${index}] stdin:`, error.message);
+	});
+
+	child.stderr.on('data', data => {
+		console.log(`[IA worker ${index}]`, data.toString().trimEnd());
+	});
+
+	child.on('error', error => {
+		console.error(`[IA worker ${index}] No se pudo iniciar:`, error.message);
+		// A spawn failure (e.g. ENOENT) emits 'error' and 'close' but never 'exit'
+		if (!workers.some(other => other && other.ready)) {
+			failQueuedJobs(`No se pudo iniciar el worker de IA: ${error.message}`);
+		}
+	});
+
+	child.on('close', code => {
+		const job = worker.current;
+		worker.current = null;
+		worker.ready = false;
+		if (job) {
+			clearTimeout(job.timer);
+			finishJob(
+				job,
+				1,
+				'',
+				`El worker de IA terminó inesperadamente (código ${code})`,
+			);
+		}
+		// Exponential backoff, reset once the worker reports ready
+		const failures = restartFailures[index] ?? 0;
+		restartFailures[index] = failures + 1;
+		const delay = Math.min(
+			RESTART_DELAY_MS * 2 ** failures,
+			MAX_RESTART_DELAY_MS,
+		);
+		setTimeout(() => {
+			workers[index] = startWorker(index);
+		}, delay);
+	});
+
+	return worker;
+};
+
+const ensurePool = () => {
+	for (let index = workers.length; index < POOL_SIZE; index += 1) {
+		workers.push(startWorker(index));
+	}
+};
+
+/*
+    Same interface the controllers used with spawn('python3', ['controllers/IA/ia.py', ...args]):
+    returns an emitter with stdout/stderr 'data' events and a 'close' event with the exit code.
+    With IA_WORKERS=0 it falls back to spawning ia.py for every document.
+*/
+const spawnIA = args => {
+	if (POOL_SIZE <= 0) {
+		return spawn('python3', [IA_SCRIPT, ...args], { env: pythonEnv() });
+	}
+
+	ensurePool();
+
+	const [filePath, documentType, ruc, auxiliar, auxiliarHes] = args;
+	const proc = new EventEmitter();
+	proc.stdout = new EventEmitter();
+	proc.stderr = new EventEmitter();
+
+	queue.push({
+		proc,
+		request: {
+			id: nextRequestId++,
+			file_path: filePath,
+			document_type: documentType,
+			ruc,
+			auxiliar,
+			auxiliar_hes: auxiliarHes ?? null,
+		},
+	});
+	setImmediate(dispatch);
+
+	return proc;
+};
+
+module.exports = {
+	spawnIA,
+};
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Los módulos de la IA se importan por nombre, igual que cuando se ejecuta ia.py
+IA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'controllers', 'IA')
+sys.path.insert(0, os.path.abspath(IA_DIR))
@@ -0,0 +1,24 @@
+import os
+
+import fitz
+
+from ia import coldstart_report
+
+
+def build_invoice_pdf(path):
+    document = fitz.open()
+    page = document.new_page()
+    page.insert_text((72, 72), "INVOICE\nInvoice Number: 001-001-000000123\nTotal Due: 100.00")
+    document.save(str(path))
+    document.close()
+
+
+def test_inferencia_de_factura_no_carga_modulos_pesados(tmp_path, monkeypatch):
+    # config.py exige TESSDATA_PREFIX; el PDF tiene capa de texto y no llega a usar OCR
+    monkeypatch.setenv("TESSDATA_PREFIX", os.getenv("TESSDATA_PREFIX") or str(tmp_path))
+    pdf_path = tmp_path / "invoice.pdf"
+    build_invoice_pdf(pdf_path)
+
+    report = coldstart_report(str(pdf_path), "Invoice")
+
+    assert report["heavy_modules"] == []
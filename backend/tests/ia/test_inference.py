@@ -0,0 +1,41 @@
+import pytest
+import torch
+
+from model import DocumentCNN, TabularHead
+from inference import load_model, DOCUMENT_TYPES
+
+
+def save_checkpoint(tmp_path, state_dict):
+    path = tmp_path / "model_fold_invoice1.pth"
+    torch.save(state_dict, path)
+    return str(path)
+
+
+def assert_same_weights(model, state_dict):
+    for key, value in model.state_dict().items():
+        assert torch.equal(value, state_dict[key]), key
+
+
+def test_load_model_acepta_checkpoint_del_formato_original(tmp_path):
+    state_dict = DocumentCNN(num_classes=len(DOCUMENT_TYPES)).state_dict()
+    model = load_model(model_path=save_checkpoint(tmp_path, state_dict))
+
+    assert not model.training
+    assert_same_weights(model, state_dict)
+
+
+def test_load_model_ignora_la_cabeza_tabular_de_checkpoints_intermedios(tmp_path):
+    state_dict = DocumentCNN(num_classes=len(DOCUMENT_TYPES)).state_dict()
+    tabular = TabularHead(10, len(DOCUMENT_TYPES)).state_dict()
+    state_dict.update({f"tabular_head.{key}": value for key, value in tabular.items()})
+
+    model = load_model(model_path=save_checkpoint(tmp_path, state_dict))
+    assert_same_weights(model, state_dict)
+
+
+def test_load_model_rechaza_checkpoints_de_otro_modelo(tmp_path):
+    state_dict = DocumentCNN(num_classes=len(DOCUMENT_TYPES)).state_dict()
+    del state_dict["classifier.3.weight"]
+
+    with pytest.raises(RuntimeError, match="classifier.3.weight"):
+        load_model(model_path=save_checkpoint(tmp_path, state_dict))
@@ -0,0 +1,52 @@
+import io
+
+import fitz
+from PIL import Image
+
+import ocr_cache
+from document import ParsedDocument
+from extractions import extract_text_from_pdf, extract_text_near_signature, OCR_DPI
+from ocr_engine import TSV_HEADER
+
+
+def build_scanned_pdf(path):
+    buffer = io.BytesIO()
+    Image.new("RGB", (850, 1100), "white").save(buffer, "PNG")
+    document = fitz.open()
+    page = document.new_page()
+    page.insert_image(page.rect, stream=buffer.getvalue())
+    document.save(str(path))
+    document.close()
+
+
+def word(text, left, top, line, word_num):
+    # Fila TSV de Tesseract (nivel 5 = palabra) en píxeles de la página a OCR_DPI
+    return "\t".join(str(value) for value in (5, 1, 1, 1, line, word_num, left, top, 100, 30, 95, text))
+
+
+def test_modo_pagina_reconoce_cada_pagina_escaneada_una_sola_vez(tmp_path, monkeypatch):
+    monkeypatch.setenv("OCR_MODE", "page")
+    scale = OCR_DPI / 72
+    rows = [
+        word("Factura", 100, 100, 1, 1),
+        word("Juan", int(60 * scale), int(620 * scale), 2, 1),
+        word("Perez", int(60 * scale) + 120, int(620 * scale), 2, 2),
+    ]
+    calls = []
+
+    def image_to_data(image, lang="eng", config=""):
+        calls.append(lang)
+        return "\n".join([TSV_HEADER] + rows)
+
+    monkeypatch.setattr(ocr_cache, "image_to_data", image_to_data)
+    pdf_path = tmp_path / "scan.pdf"
+    build_scanned_pdf(pdf_path)
+
+    with ParsedDocument(str(pdf_path)) as document:
+        assert document.page_classification(0)["kind"] == "image"
+        text = extract_text_from_pdf(document)
+        signature_text = extract_text_near_signature(document, 0, (36, 600, 324, 700))
+
+    assert "Factura" in text
+    assert signature_text == "Juan Perez"
+    assert len(calls) == 1